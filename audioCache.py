@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+
+from trackCache import cache_key
+
+log = logging.getLogger("LocalAudioCache")
+
+DOWNLOAD_OPTS = {
+    'format': 'bestaudio/best',
+    'quiet': True,
+    'no_warnings': True,
+    'noplaylist': True,
+    'source_address': '0.0.0.0',  # IPv6 issues workaround
+}
+
+
+class LocalAudioCache:
+    """
+    On-disk tier for hot tracks. Once a track has been played promote_after times it is downloaded in the
+    background and transcoded once to 48 kHz Opus, so later plays come from disk with no re-encoding.
+    Total size is capped at max_bytes, evicting the least recently played files first.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 ** 3, promote_after: int = 3,
+                 max_play_counts: int = 5000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.promote_after = promote_after
+        self.max_play_counts = max_play_counts
+        self.index_file = os.path.join(directory, "index.json")
+        self.entries: dict[str, dict] = {}  # key -> {"path", "title", "size", "last_used"}
+        self.play_counts: dict[str, int] = {}
+        self.downloading: set[str] = set()
+        self.download_slot = asyncio.Semaphore(1)
+        self.tasks: set[asyncio.Task] = set()
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self.entries.values())
+
+    def lookup(self, url: str) -> Optional[str]:
+        entry = self.entries.get(cache_key(url))
+        if entry is None:
+            return None
+        entry["last_used"] = time.time()
+        return entry["path"]
+
+    def title_for(self, url: str) -> Optional[str]:
+        entry = self.entries.get(cache_key(url))
+        return entry["title"] if entry else None
+
+    def record_play(self, url: str, title: str):
+        key = cache_key(url)
+        if key in self.entries or key in self.downloading:
+            return
+
+        count = self.play_counts.get(key, 0) + 1
+        self.play_counts[key] = count
+        if count >= self.promote_after:
+            self.downloading.add(key)
+            task = asyncio.create_task(self._promote(key, url, title))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        elif len(self.play_counts) > self.max_play_counts:
+            # forget the one-off plays so the counter table doesn't grow forever
+            self.play_counts = {k: v for k, v in self.play_counts.items() if v > 1}
+
+    async def _promote(self, key: str, url: str, title: str):
+        try:
+            async with self.download_slot:
+                path = await self._download_and_transcode(key, url)
+            size = os.path.getsize(path)
+            self.entries[key] = {"path": path, "title": title, "size": size, "last_used": time.time()}
+            self.play_counts.pop(key, None)
+            self._evict()
+            self.save()
+            log.info("Cached %s (%d KiB)", url, size // 1024)
+        except Exception as e:
+            log.warning("Failed to cache %s: %s", url, e)
+        finally:
+            self.downloading.discard(key)
+
+    async def _download_and_transcode(self, key: str, url: str) -> str:
+        with tempfile.TemporaryDirectory(dir=self.directory) as workdir:
+            source = await asyncio.to_thread(self._download, url, workdir)
+
+            target = os.path.join(self.directory, f"{key.replace(':', '_').replace('/', '_')}.opus")
+            tmp_target = os.path.join(workdir, "out.opus")
+            process = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-y", "-loglevel", "error", "-i", source, "-vn",
+                "-c:a", "libopus", "-b:a", "128k", "-ar", "48000", "-ac", "2", tmp_target,
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+            )
+            _, stderr = await process.communicate()
+            if process.returncode != 0:
+                raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace')}")
+            os.replace(tmp_target, target)
+        return target
+
+    @staticmethod
+    def _download(url: str, workdir: str) -> str:
+        import yt_dlp
+
+        opts = {**DOWNLOAD_OPTS, 'outtmpl': os.path.join(workdir, 'source.%(ext)s')}
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            return ydl.prepare_filename(info)
+
+    def _evict(self):
+        total = self.total_bytes
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            entry = self.entries.pop(key)
+            total -= entry["size"]
+            try:
+                os.remove(entry["path"])
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "downloading": len(self.downloading),
+        }
+
+    def load(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, "r") as file:
+                data = json.load(file)
+        except Exception as e:
+            log.error("Failed to load %s: %s", self.index_file, e)
+            return
+        # files removed by hand just drop out of the index
+        self.entries = {key: entry for key, entry in data.items() if os.path.exists(entry["path"])}
+
+    def save(self):
+        tmp = f"{self.index_file}.tmp"
+        with open(tmp, "w") as file:
+            json.dump(self.entries, file, separators=(",", ":"))
+        os.replace(tmp, self.index_file)
+
+    async def close(self):
+        for task in list(self.tasks):
+            task.cancel()
+        self.save()
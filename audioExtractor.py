@@ -0,0 +1,69 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from trackCache import TrackCache, stream_expiry
+
+YTDLP_OPTS = {
+    # opus streams (youtube's webm audio) can be passed straight through to discord without re-encoding
+    'format': 'bestaudio[acodec=opus]/bestaudio/best',
+    'quiet': True,
+    'no_warnings': True,
+    'default_search': 'auto',
+    'source_address': '0.0.0.0',  # IPv6 issues workaround
+}
+
+
+class AudioExtractor:
+    def __init__(self, max_workers: int = 2, timeout: float = 30.0, cache: Optional[TrackCache] = None):
+        self.timeout = timeout
+        self.cache = cache
+        # yt-dlp is blocking (network + parsing), so it never runs on the event loop
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ytdlp")
+
+    @staticmethod
+    def _extract(url: str) -> dict:
+        # yt_dlp takes a noticeable chunk of startup to import and only /play needs it
+        import yt_dlp
+
+        with yt_dlp.YoutubeDL(YTDLP_OPTS) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    async def extract(self, url: str, timeout: Optional[float] = None) -> dict:
+        """
+        Resolve url to {"url", "title", "duration", "acodec", "expires_at"}, from the cache if possible,
+        otherwise by running extract_info in the pool. Raises asyncio.TimeoutError if it takes too long.
+        """
+        if self.cache:
+            entry = self.cache.get(url)
+            if entry:
+                return entry
+
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        if timeout <= 0:
+            raise asyncio.TimeoutError()
+
+        loop = asyncio.get_running_loop()
+        # cancelling the wrapped future drops the job if a worker hasn't picked it up yet;
+        # a job that already started finishes in the background and its result is discarded
+        started = time.perf_counter()
+        future = loop.run_in_executor(self.executor, self._extract, url)
+        info = await asyncio.wait_for(future, timeout)
+        elapsed = time.perf_counter() - started
+
+        if self.cache:
+            return self.cache.put(url, info, elapsed)
+        return {
+            "url": info["url"],
+            "title": info.get("title", "Unknown Title"),
+            "duration": info.get("duration"),
+            "acodec": info.get("acodec"),
+            "expires_at": stream_expiry(info["url"]),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.cache:
+            self.cache.save()
@@ -0,0 +1,587 @@
+"""
+Offline benchmark for the bot's handlers.
+
+Imports main.py without connecting to Discord, swaps the client for a fake gateway with fake
+guilds/members/channels, replays synthetic event streams and prints a JSON report.
+
+    python benchmark.py                          # all scenarios
+    python benchmark.py reactions joins -n 2000  # some scenarios, smaller streams
+    python benchmark.py --output new.json --compare old.json
+    python benchmark.py --playback song.webm --streams 8  # CPU per stream for each playback path
+    python benchmark.py --gateway                 # startup time and RSS, full vs lean gateway mode
+
+--gateway is the one mode that does connect: it starts the bot from the current directory once per
+GATEWAY_MODE with TOKEN from the environment/.env, records the numbers at ready and logs out again.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import discord
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+GUILD_ID = 1000
+
+
+class FakeApi:
+    """Counts the REST calls the handlers would have made and optionally simulates their latency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: dict[str, int] = defaultdict(int)
+
+    async def call(self, route: str):
+        self.calls[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def reset(self):
+        self.calls.clear()
+
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str, ban_members: bool = False, default: bool = False):
+        self.id = role_id
+        self.name = name
+        self.mention = f"<@&{role_id}>"
+        self.permissions = discord.Permissions(ban_members=ban_members)
+        self._default = default
+
+    def is_default(self) -> bool:
+        return self._default
+
+
+class FakeMember:
+    def __init__(self, api: FakeApi, guild: "FakeGuild", member_id: int, name: str):
+        self.api = api
+        self.guild = guild
+        self.id = member_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{member_id}>"
+        self.bot = False
+        self.roles = [guild.default_role]
+        self.guild_permissions = discord.Permissions.all()
+        self.joined_at = discord.utils.utcnow()
+
+    async def edit(self, *, roles=None, reason=None, **kwargs):
+        await self.api.call("PATCH /guilds/{guild_id}/members/{user_id}")
+        if roles is not None:
+            self.roles = [self.guild.default_role] + [self.guild.get_role(r.id) for r in roles]
+
+    async def add_roles(self, *roles, reason=None):
+        for role in roles:
+            await self.api.call("PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}")
+            self.roles.append(role)
+
+    async def remove_roles(self, *roles, reason=None):
+        for role in roles:
+            await self.api.call("DELETE /guilds/{guild_id}/members/{user_id}/roles/{role_id}")
+            self.roles.remove(role)
+
+    async def send(self, *args, **kwargs):
+        await self.api.call("POST /channels/{channel_id}/messages (dm)")
+
+
+class FakeChannel:
+    def __init__(self, api: FakeApi, guild: "FakeGuild", channel_id: int, name: str, overwrites=None):
+        self.api = api
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self.mention = f"<#{channel_id}>"
+        self.overwrites = overwrites or {}
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        await self.api.call("POST /channels/{channel_id}/messages")
+        self.sent += 1
+
+    async def edit(self, **kwargs):
+        await self.api.call("PATCH /channels/{channel_id}")
+        self.name = kwargs.get("name", self.name)
+        self.overwrites = kwargs.get("overwrites", self.overwrites)
+
+    async def delete(self, reason=None):
+        await self.api.call("DELETE /channels/{channel_id}")
+        self.guild.channels.pop(self.id, None)
+
+    async def fetch_message(self, message_id: int):
+        await self.api.call("GET /channels/{channel_id}/messages/{message_id}")
+        return FakeMessage(self.api, message_id)
+
+
+class FakeMessage:
+    def __init__(self, api: FakeApi, message_id: int):
+        self.api = api
+        self.id = message_id
+
+    async def add_reaction(self, emoji):
+        await self.api.call("PUT /channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me")
+
+    async def clear_reaction(self, emoji):
+        await self.api.call("DELETE /channels/{channel_id}/messages/{message_id}/reactions/{emoji}")
+
+
+class FakeGuild:
+    def __init__(self, api: FakeApi, guild_id: int, members: int, roles: int):
+        self.api = api
+        self.id = guild_id
+        self.name = "bench guild"
+        self.voice_client = None
+        self.default_role = FakeRole(guild_id, "@everyone", default=True)
+        self._roles = {guild_id: self.default_role}
+        for i in range(1, roles + 1):
+            self._roles[i] = FakeRole(i, f"role-{i}", ban_members=(i % 25 == 0))
+        self.members = {}
+        for i in range(members):
+            member_id = 10_000 + i
+            self.members[member_id] = FakeMember(api, self, member_id, f"user {i}")
+        self.channels = {}
+        self._next_channel_id = 500_000
+        self.welcome_channel = self._add_channel("welcome")
+
+    def _add_channel(self, name: str, overwrites=None) -> FakeChannel:
+        self._next_channel_id += 1
+        channel = FakeChannel(self.api, self, self._next_channel_id, name, overwrites)
+        self.channels[channel.id] = channel
+        return channel
+
+    @property
+    def roles(self) -> list:
+        return list(self._roles.values())
+
+    @property
+    def text_channels(self) -> list:
+        return list(self.channels.values())
+
+    def get_role(self, role_id: int):
+        return self._roles.get(role_id)
+
+    def get_member(self, member_id: int):
+        return self.members.get(member_id)
+
+    async def fetch_member(self, member_id: int):
+        await self.api.call("GET /guilds/{guild_id}/members/{user_id}")
+        return self.members[member_id]
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+    async def create_text_channel(self, name: str, overwrites=None, reason=None, **kwargs):
+        await self.api.call("POST /guilds/{guild_id}/channels")
+        return self._add_channel(name, overwrites)
+
+    async def ban(self, user, reason=None, **kwargs):
+        await self.api.call("PUT /guilds/{guild_id}/bans/{user_id}")
+
+
+class FakeResponse:
+    def __init__(self, api: FakeApi):
+        self.api = api
+        self.done = False
+
+    async def send_message(self, *args, **kwargs):
+        await self.api.call("POST /interactions/{interaction_id}/{token}/callback")
+        self.done = True
+
+    async def defer(self, **kwargs):
+        await self.api.call("POST /interactions/{interaction_id}/{token}/callback")
+        self.done = True
+
+    async def send_modal(self, modal):
+        await self.api.call("POST /interactions/{interaction_id}/{token}/callback")
+        self.done = True
+
+    def is_done(self) -> bool:
+        return self.done
+
+
+class FakeInteraction:
+    def __init__(self, api: FakeApi, guild: FakeGuild, user: FakeMember, channel: FakeChannel):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.channel = channel
+        self.response = FakeResponse(api)
+        self.followup = SimpleNamespace(send=channel.send)
+        self.created_at = discord.utils.utcnow()
+        self.expires_at = self.created_at + datetime.timedelta(minutes=15)
+
+    def is_expired(self) -> bool:
+        return discord.utils.utcnow() >= self.expires_at
+
+
+class FakeClient:
+    def __init__(self, guild: FakeGuild):
+        self.guild = guild
+        self.user = SimpleNamespace(id=1, name="bench bot")
+
+    def get_guild(self, guild_id: int):
+        return self.guild if guild_id == self.guild.id else None
+
+
+def load_bot(workdir: str):
+    """Import main.py with its state files going to workdir."""
+    os.environ.setdefault("GUILD_ID", str(GUILD_ID))
+    os.environ.setdefault("TOKEN", "benchmark")
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import main
+    return main
+
+
+async def drain_role_updates(bot):
+    await bot.role_updates.ready.join()
+
+
+async def scenario_reactions(bot, guild: FakeGuild, n: int):
+    """n reaction adds spread over 4 mapped emojis on one self-roles message, plus unrelated noise."""
+    message_id = 900_001
+    emojis = ["🍎", "🍌", "🍇", "🍒"]
+    config = bot.guild_configs.get(guild.id)
+    for i, emoji in enumerate(emojis, start=1):
+        config.reaction_roles.setdefault(message_id, {})[emoji] = i
+        config.reaction_index.add(message_id, emoji, i)
+
+    member_ids = list(guild.members)
+    for i in range(n):
+        if i % 10 == 0:
+            # a reaction on some unrelated message
+            payload = SimpleNamespace(message_id=123, channel_id=guild.welcome_channel.id, guild_id=guild.id,
+                                      user_id=member_ids[i % len(member_ids)], emoji=discord.PartialEmoji(name="🔥"))
+        else:
+            payload = SimpleNamespace(message_id=message_id, channel_id=guild.welcome_channel.id, guild_id=guild.id,
+                                      user_id=member_ids[i % len(member_ids)],
+                                      emoji=discord.PartialEmoji(name=emojis[i % len(emojis)]))
+        await bot.on_raw_reaction_add(payload)
+    await drain_role_updates(bot)
+
+
+async def scenario_joins(bot, guild: FakeGuild, n: int):
+    bot.guild_configs.get(guild.id).set_welcome({
+        "channel_id": guild.welcome_channel.id,
+        "message": "welcome {user}!",
+        "color": 0xD5B9BA,
+        "gif_url": "",
+    })
+    bot.welcomer.invalidate(guild.id)
+    members = list(guild.members.values())
+    for i in range(n):
+        await bot.on_member_join(members[i % len(members)])
+    # whatever is still waiting on the batch interval
+    await bot.welcomer.flush(guild)
+
+
+async def scenario_tickets(bot, guild: FakeGuild, n: int):
+    """Burst of concurrent 'open ticket' clicks, every member clicking twice."""
+    channel = guild._add_channel("support")
+    view = bot.TicketView()
+    members = list(guild.members.values())[:max(n // 2, 1)]
+    clicks = [FakeInteraction(guild.api, guild, member, channel) for member in members for _ in range(2)]
+    await asyncio.gather(*(view.open_ticket.callback(interaction) for interaction in clicks))
+
+
+async def scenario_modals(bot, guild: FakeGuild, n: int):
+    admin = next(iter(guild.members.values()))
+    for i in range(n):
+        modal = bot.WelcomeMessageModal(guild.welcome_channel)
+        modal.message_input._value = f"welcome {{user}} #{i}"
+        modal.color_input._value = "#00ffcc"
+        modal.gif_input._value = ""
+        await modal.on_submit(FakeInteraction(guild.api, guild, admin, guild.welcome_channel))
+
+
+SCENARIOS = {
+    "reactions": (scenario_reactions, 1.0),
+    "joins": (scenario_joins, 0.1),
+    "tickets": (scenario_tickets, 0.05),
+    "modals": (scenario_modals, 0.05),
+}
+
+
+def record_timings(bot) -> dict[tuple[str, str], list[float]]:
+    """
+    Keep every handler duration as well. metrics' histogram buckets start at 1 ms, so its percentiles
+    can't tell a 50 us handler from a 900 us one; the report is computed from these raw samples instead.
+    """
+    timings: dict[tuple[str, str], list[float]] = defaultdict(list)
+    observe = bot.metrics.observe
+
+    def recording_observe(kind: str, name: str, seconds: float, error: bool = False):
+        timings[(kind, name)].append(seconds)
+        observe(kind, name, seconds, error)
+
+    bot.metrics.observe = recording_observe
+    return timings
+
+
+def percentile(samples: list[float], q: float) -> float:
+    # nearest rank over the sorted samples
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+def handler_report(bot, timings: dict[tuple[str, str], list[float]]) -> dict:
+    report = {}
+    for (kind, name), hist in bot.metrics.handlers.items():
+        samples = sorted(timings.get((kind, name), ()))
+        if not samples:
+            continue
+        report[f"{kind}:{name}"] = {
+            "calls": hist.count,
+            "errors": hist.errors,
+            "p50_ms": round(percentile(samples, 0.5) * 1000, 4),
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 4),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 4),
+        }
+    return report
+
+
+async def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="utilsbot-bench-")
+    bot = load_bot(workdir)
+
+    api = FakeApi(latency=args.api_latency / 1000)
+    guild = FakeGuild(api, GUILD_ID, members=args.members, roles=args.roles)
+    bot.client = FakeClient(guild)
+    bot.role_updates.client = bot.client
+    bot.role_updates.window = args.role_window
+    bot.role_updates.start()
+    timings = record_timings(bot)
+
+    results = {}
+    for name in args.scenarios:
+        scenario, scale = SCENARIOS[name]
+        events = max(int(args.events * scale), 1)
+        bot.metrics.handlers.clear()
+        timings.clear()
+        api.reset()
+
+        started = time.perf_counter()
+        await scenario(bot, guild, events)
+        elapsed = time.perf_counter() - started
+
+        results[name] = {
+            "events": events,
+            "seconds": round(elapsed, 4),
+            "events_per_second": round(events / elapsed, 1) if elapsed else None,
+            "api_calls": sum(api.calls.values()),
+            "api_calls_by_route": dict(api.calls),
+            "handlers": handler_report(bot, timings),
+        }
+
+    bot.role_updates.stop()
+    await bot.guild_configs.close()
+    await bot.ticketHandler.close()
+
+    return {
+        "python": sys.version.split()[0],
+        "discord.py": discord.__version__,
+        "members": args.members,
+        "api_latency_ms": args.api_latency,
+        "scenarios": results,
+    }
+
+
+def probe_codec(path: str) -> str:
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=codec_name",
+         "-of", "default=noprint_wrappers=1:nokey=1", path],
+        capture_output=True, text=True, check=True,
+    )
+    return result.stdout.strip()
+
+
+def run_playback(args) -> dict:
+    """
+    Play the same input through each playback path with --streams sources at once, as fast as ffmpeg
+    can feed them, and report CPU per stream per second of audio (ours plus ffmpeg's).
+    """
+    from musicQueue import make_source
+
+    codec = probe_codec(args.playback)
+    frames = int(args.seconds * 50)  # 20 ms frames
+    local = {"options": "-vn"}  # the reconnect flags only apply to http inputs
+    paths = {
+        "pcm": lambda: make_source(args.playback, codec, mode="pcm", options=local),
+        "opus-transcode": lambda: make_source(args.playback, None, options=local),
+    }
+    if codec == "opus":
+        paths["opus-copy"] = lambda: make_source(args.playback, codec, options=local)
+
+    results = {}
+    for name, build in paths.items():
+        # discord.py encodes pcm to opus in the player thread; do the same work here
+        encoder = discord.opus.Encoder() if name == "pcm" else None
+        cpu_before = time.process_time()
+        children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        started = time.perf_counter()
+
+        sources = [build() for _ in range(args.streams)]
+        played = 0
+        for _ in range(frames):
+            for source in sources:
+                data = source.read()
+                if not data:
+                    continue
+                if encoder:
+                    encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+                played += 1
+        for source in sources:
+            source.cleanup()  # waits for ffmpeg, so its cpu time shows up in RUSAGE_CHILDREN
+
+        elapsed = time.perf_counter() - started
+        children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        bot_cpu = time.process_time() - cpu_before
+        ffmpeg_cpu = (children_after.ru_utime + children_after.ru_stime) - \
+                     (children_before.ru_utime + children_before.ru_stime)
+        audio_seconds = played / 50
+        results[name] = {
+            "audio_seconds": round(audio_seconds, 2),
+            "wall_seconds": round(elapsed, 3),
+            "bot_cpu_seconds": round(bot_cpu, 3),
+            "ffmpeg_cpu_seconds": round(ffmpeg_cpu, 3),
+            "cpu_ms_per_stream_second": round((bot_cpu + ffmpeg_cpu) * 1000 / audio_seconds, 3) if played else None,
+        }
+
+    return {
+        "python": sys.version.split()[0],
+        "discord.py": discord.__version__,
+        "input": os.path.basename(args.playback),
+        "input_codec": codec,
+        "streams": args.streams,
+        "playback": results,
+    }
+
+
+GATEWAY_REPORT = "GATEWAY_REPORT "
+
+
+def run_gateway_child(mode: str):
+    """Runs in a subprocess: start the bot in the given gateway mode, report at ready, log out."""
+    os.environ["GATEWAY_MODE"] = mode
+    sys.path.insert(0, REPO_DIR)
+    import main as bot
+
+    async def report():
+        stats = {
+            "ready_seconds": round(time.perf_counter() - bot.STARTUP_BEGIN, 3),
+            "rss_mib": round(bot.rss_bytes() / 2 ** 20, 1),
+            "guilds": len(bot.client.guilds),
+            "cached_members": sum(len(guild.members) for guild in bot.client.guilds),
+            "intents": bot.client.intents.value,
+        }
+        print(GATEWAY_REPORT + json.dumps(stats), flush=True)
+        await bot.client.close()
+
+    bot.client.add_listener(report, "on_ready")
+    bot.client.run(os.environ["TOKEN"], log_handler=None)
+
+
+def run_gateway(args) -> dict:
+    results = {}
+    for mode in ("full", "lean"):
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--gateway-child", mode],
+            capture_output=True, text=True, timeout=args.gateway_timeout,
+        )
+        lines = [line for line in process.stdout.splitlines() if line.startswith(GATEWAY_REPORT)]
+        if not lines:
+            raise RuntimeError(f"{mode} run never reached ready:\n{process.stdout}{process.stderr}")
+        results[mode] = json.loads(lines[-1][len(GATEWAY_REPORT):])
+
+    full, lean = results["full"], results["lean"]
+    return {
+        "python": sys.version.split()[0],
+        "discord.py": discord.__version__,
+        "gateway": results,
+        "lean_vs_full": {
+            "ready_seconds_saved": round(full["ready_seconds"] - lean["ready_seconds"], 3),
+            "rss_mib_saved": round(full["rss_mib"] - lean["rss_mib"], 1),
+        },
+    }
+
+
+def compare(current: dict, previous: dict) -> dict:
+    """Per-scenario throughput, API call and handler p95 deltas against an earlier report."""
+    deltas = {}
+    for mode, result in current.get("gateway", {}).items():
+        before = previous.get("gateway", {}).get(mode)
+        if before:
+            deltas[f"gateway-{mode}"] = {key: [before[key], result[key]] for key in ("ready_seconds", "rss_mib")}
+    for name, result in current.get("playback", {}).items():
+        before = previous.get("playback", {}).get(name)
+        if before:
+            deltas[name] = {"cpu_ms_per_stream_second": [before["cpu_ms_per_stream_second"],
+                                                         result["cpu_ms_per_stream_second"]]}
+    for name, result in current.get("scenarios", {}).items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        deltas[name] = {
+            "events_per_second": [before["events_per_second"], result["events_per_second"]],
+            "api_calls": [before["api_calls"], result["api_calls"]],
+            "handler_p95_ms": {
+                handler: [before["handlers"][handler]["p95_ms"], stats["p95_ms"]]
+                for handler, stats in result["handlers"].items() if handler in before.get("handlers", {})
+            },
+        }
+    return deltas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("-n", "--events", type=int, default=10_000, help="base event count (reactions use all of it)")
+    parser.add_argument("--members", type=int, default=2_000)
+    parser.add_argument("--roles", type=int, default=100)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated ms per REST call")
+    parser.add_argument("--role-window", type=float, default=0.05, help="role update coalescing window (s)")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--compare", help="earlier report to diff against")
+    parser.add_argument("--playback", metavar="FILE", help="benchmark playback paths on this audio file instead")
+    parser.add_argument("--streams", type=int, default=4, help="concurrent streams for --playback")
+    parser.add_argument("--seconds", type=float, default=30, help="seconds of audio per stream for --playback")
+    parser.add_argument("--gateway", action="store_true", help="compare startup and RSS of full vs lean gateway")
+    parser.add_argument("--gateway-timeout", type=float, default=600, help="seconds to wait for ready per mode")
+    parser.add_argument("--gateway-child", choices=("full", "lean"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.gateway_child:
+        run_gateway_child(args.gateway_child)
+        return
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    # the bot runs from a temp dir so its state files don't touch the real ones
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+
+    if args.gateway:
+        report = run_gateway(args)
+    elif args.playback:
+        report = run_playback(args)
+    else:
+        report = asyncio.run(run(args))
+    if args.compare:
+        with open(args.compare, "r") as file:
+            report["compare"] = compare(report, json.load(file))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
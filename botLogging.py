@@ -0,0 +1,98 @@
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+# guild / user / command of the handler currently running, set by metrics.timed and stamped onto every record
+log_context: contextvars.ContextVar[dict] = contextvars.ContextVar("log_context", default={})
+
+# attributes every LogRecord has; anything else on a record came in through `extra` and gets emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, then any context/extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # the stock prepare() folds the traceback into the message; keep it separate so it stays its own field
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_levels(text: str) -> dict[str, str]:
+    """'DmOutbox=DEBUG,discord=WARNING' -> {"DmOutbox": "DEBUG", "discord": "WARNING"}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level: str = "INFO", levels: Optional[dict[str, str]] = None, filename: Optional[str] = None,
+                  max_bytes: int = 10 * 1024 ** 2, backups: int = 5) -> logging.handlers.QueueListener:
+    """
+    Route every logger (ours and discord.py's) through a queue. Callers only pay for building the record;
+    a listener thread does the formatting and the writes to stderr and, if filename is set, a rotating file.
+    Loggers are named after the subsystem ("JsonHandler", "DmOutbox", ...), so levels can be set per
+    subsystem. Returns the started listener; stop() it on shutdown to drain the queue.
+    """
+    formatter = JsonFormatter()
+    outputs: list[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if filename:
+        outputs.append(logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+        ))
+    for output in outputs:
+        output.setFormatter(formatter)
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name, subsystem_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(subsystem_level)
+
+    listener = logging.handlers.QueueListener(records, *outputs, respect_handler_level=True)
+    listener.start()
+    return listener
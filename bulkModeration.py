@@ -0,0 +1,161 @@
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Awaitable, Callable, Optional
+
+import discord
+
+from dmOutbox import DmOutbox
+
+USER_ID_RE = re.compile(r"\d{15,20}")
+BULK_BAN_LIMIT = 200  # users per bulk-ban request
+
+
+def parse_user_ids(text: str) -> list[int]:
+    """User ids from a free-form list (plain ids or mentions, any separators), in order and without duplicates."""
+    return list(dict.fromkeys(int(match) for match in USER_ID_RE.findall(text)))
+
+
+def recent_joins(guild: discord.Guild, minutes: int) -> list[int]:
+    """Ids of non-bot members who joined in the last `minutes` minutes."""
+    cutoff = discord.utils.utcnow() - timedelta(minutes=minutes)
+    return [
+        member.id for member in guild.members
+        if member.joined_at and member.joined_at >= cutoff and not member.bot and member.id != guild.owner_id
+    ]
+
+
+class BulkJob:
+    """Progress of one bulk action over a list of users."""
+
+    def __init__(self, action: str, total: int):
+        self.action = action
+        self.total = total
+        self.done = 0
+        self.skipped = 0
+        self.failed: dict[int, str] = {}  # user id -> reason
+        self.dms_queued = 0
+        self.started = time.monotonic()
+
+    @property
+    def processed(self) -> int:
+        return self.done + self.skipped + len(self.failed)
+
+    def progress(self) -> str:
+        return f"⏳ {self.action}: {self.processed}/{self.total} ({self.done} done, {len(self.failed)} failed)"
+
+    def summary(self, max_failures: int = 10) -> str:
+        elapsed = time.monotonic() - self.started
+        lines = [
+            f"✅ {self.action}: {self.done} done, {self.skipped} skipped, {len(self.failed)} failed "
+            f"out of {self.total} in {elapsed:.1f}s"
+        ]
+        if self.dms_queued:
+            lines.append(f"📨 {self.dms_queued} DMs are being sent in the background")
+        for user_id, reason in list(self.failed.items())[:max_failures]:
+            lines.append(f"• `{user_id}`: {reason}")
+        if len(self.failed) > max_failures:
+            lines.append(f"… and {len(self.failed) - max_failures} more")
+        return "\n".join(lines)
+
+
+class BulkModerator:
+    """
+    Runs one moderation action over many users with a bounded pool of workers. discord.py already waits out
+    each route's rate-limit bucket; a 429 that still gets through pauses every worker and the user is retried.
+    DMs go through the outbox so they never hold up the actions themselves.
+    """
+
+    def __init__(self, outbox: DmOutbox, workers: int = 5, max_retries: int = 3):
+        self.outbox = outbox
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_until = 0.0
+
+    async def run(self, job: BulkJob, user_ids: list[int], act: Callable[[int], Awaitable[bool]],
+                  report: Optional[Callable[[BulkJob], Awaitable[None]]] = None, report_interval: float = 2.0):
+        """
+        Call act(user_id) for every user, at most `workers` at a time. act returns False to mark the user
+        skipped (e.g. not a member); NotFound counts as skipped too, any other error as failed.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for user_id in user_ids:
+            queue.put_nowait(user_id)
+
+        async def worker():
+            while not queue.empty():
+                user_id = queue.get_nowait()
+                await self._attempt(job, user_id, act)
+
+        async with self._reporting(job, report, report_interval):
+            await asyncio.gather(*(worker() for _ in range(min(self.workers, len(user_ids)))))
+
+    async def _attempt(self, job: BulkJob, user_id: int, act: Callable[[int], Awaitable[bool]]):
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                if await act(user_id):
+                    job.done += 1
+                else:
+                    job.skipped += 1
+                return
+            except discord.NotFound:
+                job.skipped += 1
+                return
+            except discord.Forbidden:
+                job.failed[user_id] = "missing permissions"
+                return
+            except discord.HTTPException as e:
+                if e.status != 429 or attempt >= self.max_retries:
+                    job.failed[user_id] = e.text or f"HTTP {e.status}"
+                    return
+                self.backoff_until = max(self.backoff_until, time.monotonic() + min(2 ** attempt, 30))
+
+    async def ban(self, job: BulkJob, guild: discord.Guild, user_ids: list[int], reason: str,
+                  report: Optional[Callable[[BulkJob], Awaitable[None]]] = None, report_interval: float = 2.0):
+        """
+        Ban through the bulk-ban endpoint, up to BULK_BAN_LIMIT users per request. No DMs: once banned, a
+        user usually shares no server with the bot anymore, so Discord rejects them.
+        """
+        async with self._reporting(job, report, report_interval):
+            for start in range(0, len(user_ids), BULK_BAN_LIMIT):
+                chunk = user_ids[start:start + BULK_BAN_LIMIT]
+                try:
+                    result = await guild.bulk_ban([discord.Object(id=user_id) for user_id in chunk], reason=reason)
+                except discord.Forbidden:
+                    job.failed.update((user_id, "missing permissions") for user_id in chunk)
+                    continue
+                except discord.HTTPException as e:
+                    job.failed.update((user_id, e.text or f"HTTP {e.status}") for user_id in chunk)
+                    continue
+                job.done += len(result.banned)
+                # Discord doesn't say why; usually already banned or above the bot in the role list
+                job.failed.update((user.id, "not banned") for user in result.failed)
+
+    def notify(self, job: BulkJob, user_id: int, text: str):
+        """Queue a DM to the user through the outbox."""
+        if self.outbox.send(user_id, text):
+            job.dms_queued += 1
+
+    @asynccontextmanager
+    async def _reporting(self, job: BulkJob, report: Optional[Callable[[BulkJob], Awaitable[None]]],
+                         interval: float):
+        """Calls report(job) every interval seconds while the block runs."""
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await report(job)
+                except discord.HTTPException:
+                    pass  # a missed progress update isn't worth failing the job over
+
+        task = asyncio.create_task(loop()) if report else None
+        try:
+            yield
+        finally:
+            if task:
+                task.cancel()
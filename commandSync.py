@@ -0,0 +1,39 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+import discord
+from discord import app_commands
+
+
+def command_hash(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake]) -> str:
+    payload = {
+        "global": [command.to_dict(tree) for command in tree.get_commands()],
+        "guild": [command.to_dict(tree) for command in tree.get_commands(guild=guild)] if guild else [],
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+async def sync_if_changed(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake],
+                          filename: str) -> bool:
+    """
+    Sync global commands (and the dev guild's, if given) only when their schemas changed since the last sync.
+    Returns True if synced.
+    """
+    digest = command_hash(tree, guild)
+    stamp = f"{guild.id if guild else 'global'}:{digest}"
+
+    if os.path.exists(filename):
+        with open(filename, "r") as file:
+            if file.read().strip() == stamp:
+                return False
+
+    await tree.sync()
+    if guild:
+        await tree.sync(guild=guild)
+
+    with open(filename, "w") as file:
+        file.write(stamp)
+    return True
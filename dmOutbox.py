@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+
+import discord
+
+log = logging.getLogger("DmOutbox")
+
+
+class DmOutbox:
+    """
+    Delivers DMs from background workers so commands can respond without waiting on them. Identical messages
+    to the same user within dedup_window seconds are sent once, the queue is bounded, and rate limits and
+    server errors are retried with backoff. Each message's outcome is logged.
+    """
+
+    def __init__(self, client: discord.Client, max_queue: int = 1000, workers: int = 2, max_retries: int = 3,
+                 dedup_window: float = 60):
+        self.client = client
+        self.workers = workers
+        self.max_retries = max_retries
+        self.dedup_window = dedup_window
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.recent: dict[tuple[int, str], float] = {}  # (user id, text) -> when it was queued
+        self.tasks: list[asyncio.Task] = []
+        self.counts = {"queued": 0, "delivered": 0, "dms_closed": 0, "failed": 0, "deduplicated": 0, "dropped": 0}
+
+    def start(self):
+        for _ in range(self.workers):
+            self.tasks.append(asyncio.create_task(self._worker()))
+
+    async def close(self, timeout: float = 5.0):
+        """Give queued DMs a few seconds to go out, then stop the workers."""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            log.warning("Shutting down with %d DMs undelivered", self.queue.qsize())
+        for task in self.tasks:
+            task.cancel()
+        self.tasks.clear()
+
+    def send(self, user_id: int, text: str) -> bool:
+        """Queue a DM. Returns False if it's a duplicate or the queue is full."""
+        now = time.monotonic()
+        if len(self.recent) > self.queue.maxsize:
+            self.recent = {key: at for key, at in self.recent.items() if now - at < self.dedup_window}
+        key = (user_id, text)
+        if now - self.recent.get(key, float("-inf")) < self.dedup_window:
+            self.counts["deduplicated"] += 1
+            return False
+
+        try:
+            self.queue.put_nowait((user_id, text, 0))
+        except asyncio.QueueFull:
+            self.counts["dropped"] += 1
+            log.warning("Queue full, dropped DM to %s", user_id, extra={"user": user_id})
+            return False
+        self.recent[key] = now
+        self.counts["queued"] += 1
+        return True
+
+    def _retry(self, user_id: int, text: str, attempt: int):
+        try:
+            self.queue.put_nowait((user_id, text, attempt))
+        except asyncio.QueueFull:
+            self.counts["dropped"] += 1
+            log.warning("Queue full, dropped retry of DM to %s", user_id, extra={"user": user_id})
+
+    def stats(self) -> dict:
+        return {"queue_depth": self.queue.qsize(), **self.counts}
+
+    async def _worker(self):
+        while True:
+            user_id, text, attempt = await self.queue.get()
+            try:
+                await self._deliver(user_id, text, attempt)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counts["failed"] += 1
+                log.error("DM to %s failed: %s", user_id, e, extra={"user": user_id})
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, user_id: int, text: str, attempt: int):
+        try:
+            user = self.client.get_user(user_id) or await self.client.fetch_user(user_id)
+            await user.send(text)
+        except discord.Forbidden:
+            # DMs closed, or no server in common anymore; retrying won't change that
+            self.counts["dms_closed"] += 1
+            log.info("DM to %s not delivered: DMs closed", user_id, extra={"user": user_id})
+            return
+        except discord.NotFound:
+            self.counts["failed"] += 1
+            log.warning("DM to %s not delivered: unknown user", user_id, extra={"user": user_id})
+            return
+        except discord.HTTPException as e:
+            if (e.status != 429 and e.status < 500) or attempt >= self.max_retries:
+                raise
+            backoff = min(2 ** attempt * 5, 60)
+            log.info("DM to %s got HTTP %s, retrying in %ss", user_id, e.status, backoff, extra={"user": user_id})
+            # requeue later instead of sleeping here, so one slow DM doesn't hold up a worker
+            asyncio.get_running_loop().call_later(backoff, self._retry, user_id, text, attempt + 1)
+            return
+
+        self.counts["delivered"] += 1
+        log.debug("Delivered DM to %s", user_id, extra={"user": user_id, "retries": attempt})
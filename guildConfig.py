@@ -0,0 +1,151 @@
+import logging
+import os
+import time
+from typing import Optional
+
+from jsonHandler import JsonHandler
+from reactionIndex import ReactionRoleIndex
+from sqliteHandler import ReactionChannelSqlite, ReactionRoleSqlite, WelcomeSqlite, connect
+
+log = logging.getLogger("GuildConfigCache")
+
+
+class GuildConfig:
+    """One guild's reaction roles and welcome settings. Each store has its own handler, so saves only touch this guild."""
+
+    def __init__(self, guild_id: int, reaction_handler: JsonHandler, channel_handler: JsonHandler,
+                 welcome_handler: JsonHandler):
+        self.guild_id = guild_id
+        self.reaction_handler = reaction_handler
+        self.reaction_roles = reaction_handler.map  # {message_id: {emoji: role_id}}
+        self.reaction_index = ReactionRoleIndex()
+        self.reaction_index.build(self.reaction_roles)
+        self.channel_handler = channel_handler
+        self.message_channels = channel_handler.map  # {message_id: channel_id} for reaction-role messages
+        self.welcome_handler = welcome_handler
+
+    @property
+    def welcome(self) -> Optional[dict]:
+        return self.welcome_handler.map.get(self.guild_id)
+
+    def set_message_channel(self, message_id: int, channel_id: int):
+        if self.message_channels.get(message_id) != channel_id:
+            self.message_channels[message_id] = channel_id
+            self.channel_handler.save(message_id)
+
+    def forget_message_channel(self, message_id: int):
+        if self.message_channels.pop(message_id, None) is not None:
+            self.channel_handler.save(message_id)
+
+    def set_welcome(self, config: dict):
+        self.welcome_handler.map[self.guild_id] = config
+        self.welcome_handler.save(self.guild_id)
+
+    async def close(self):
+        await self.reaction_handler.close()
+        await self.channel_handler.close()
+        await self.welcome_handler.close()
+
+
+class GuildConfigCache:
+    """
+    Per-guild configs, loaded the first time an event or command touches the guild, so memory and startup
+    time follow the guilds that are actually active. The json backend keeps one directory per guild under
+    data_dir; the sqlite backend keeps everything in db_file and reads one guild's rows at a time.
+    """
+
+    def __init__(self, backend: str = "json", data_dir: str = "data", db_file: str = "bot.db",
+                 flush_delay: float = 2.0):
+        self.backend = backend
+        self.data_dir = data_dir
+        self.db_file = db_file
+        self.flush_delay = flush_delay
+        self.configs: dict[int, GuildConfig] = {}
+        self.load_time = 0.0
+        self.conn = None
+        if backend == "sqlite":
+            self.conn = connect(db_file)
+            ReactionRoleSqlite.prepare(self.conn)
+            ReactionChannelSqlite.prepare(self.conn)
+            WelcomeSqlite.prepare(self.conn)
+
+    def get(self, guild_id: int) -> GuildConfig:
+        config = self.configs.get(guild_id)
+        if config is None:
+            started = time.perf_counter()
+            config = self.configs[guild_id] = GuildConfig(guild_id, *self._handlers(guild_id))
+            self.load_time += time.perf_counter() - started
+        return config
+
+    def _handlers(self, guild_id: int) -> tuple[JsonHandler, JsonHandler, JsonHandler]:
+        if self.conn is not None:
+            return (
+                ReactionRoleSqlite(self.db_file, self.flush_delay, guild_id=guild_id, conn=self.conn),
+                ReactionChannelSqlite(self.db_file, self.flush_delay, guild_id=guild_id, conn=self.conn),
+                WelcomeSqlite(self.db_file, self.flush_delay, guild_id=guild_id, conn=self.conn),
+            )
+        folder = os.path.join(self.data_dir, str(guild_id))
+        return (
+            JsonHandler(os.path.join(folder, "reaction_roles.json"), self.flush_delay),
+            JsonHandler(os.path.join(folder, "reaction_channels.json"), self.flush_delay),
+            JsonHandler(os.path.join(folder, "welcome.json"), self.flush_delay),
+        )
+
+    def guilds_with_reaction_roles(self) -> list[int]:
+        """Guild ids with stored reaction roles, without loading their configs."""
+        if self.conn is not None:
+            rows = self.conn.execute("SELECT DISTINCT guild_id FROM reaction_role_map WHERE guild_id IS NOT NULL")
+            return [guild_id for (guild_id,) in rows]
+        if not os.path.isdir(self.data_dir):
+            return []
+        return [
+            int(name) for name in os.listdir(self.data_dir)
+            if name.isdigit() and os.path.exists(os.path.join(self.data_dir, name, "reaction_roles.json"))
+        ]
+
+    def migrate_legacy(self, guild_id: Optional[int], reaction_file: str = "save.json",
+                       welcome_file: str = "welcome.json"):
+        """
+        One-time import of the single-guild stores. The old reaction-role file has no guild ids, so its
+        entries (and any unpartitioned sqlite rows) go to guild_id. Legacy files are renamed to *.migrated.
+        """
+        if self.conn is not None and guild_id is not None:
+            with self.conn:
+                adopted = self.conn.execute(
+                    "UPDATE reaction_role_map SET guild_id = ? WHERE guild_id IS NULL", (guild_id,)
+                ).rowcount
+            if adopted:
+                log.info("Assigned %d reaction-role rows to guild %s", adopted, guild_id)
+
+        if os.path.exists(reaction_file):
+            if guild_id is None:
+                log.warning("%s has no guild ids; set GUILD_ID once to import it", reaction_file)
+            else:
+                legacy = JsonHandler(reaction_file)
+                config = self.get(guild_id)
+                for message_id, mapping in legacy.map.items():
+                    config.reaction_roles.setdefault(message_id, {}).update(mapping)
+                    for emoji, role_id in mapping.items():
+                        config.reaction_index.add(message_id, emoji, role_id)
+                config.reaction_handler.save()
+                config.reaction_handler.flush()
+                os.replace(reaction_file, f"{reaction_file}.migrated")
+                log.info("Migrated %d messages from %s", len(legacy.map), reaction_file)
+
+        if os.path.exists(welcome_file):
+            legacy = JsonHandler(welcome_file)
+            for legacy_guild_id, welcome in legacy.map.items():
+                config = self.get(legacy_guild_id)
+                config.set_welcome(welcome)
+                config.welcome_handler.flush()
+            os.replace(welcome_file, f"{welcome_file}.migrated")
+            log.info("Migrated %d welcome configs from %s", len(legacy.map), welcome_file)
+
+    def stats(self) -> dict:
+        return {"loaded": len(self.configs), "load_seconds": self.load_time}
+
+    async def close(self):
+        for config in self.configs.values():
+            await config.close()
+        if self.conn is not None:
+            self.conn.close()
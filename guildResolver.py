@@ -0,0 +1,95 @@
+from typing import Optional
+
+import discord
+
+
+class GuildResolver:
+    """
+    Per-guild cache of the roles and channels that commands look up by name or permission, so they don't
+    rescan guild.roles / guild.channels every time. Entries (including "not found") are filled on first use
+    and dropped by the role and channel gateway events; only ids are kept, the objects come from the guild.
+    """
+
+    def __init__(self):
+        self.named_roles: dict[int, dict[str, Optional[int]]] = {}  # guild id -> {name: role id or None}
+        self.mod_roles: dict[int, list[int]] = {}  # guild id -> ids of roles that can ban
+        self.categories: dict[int, dict[str, Optional[int]]] = {}  # guild id -> {name: category id or None}
+        self.hits = {"role": 0, "mod_roles": 0, "category": 0}
+        self.misses = {"role": 0, "mod_roles": 0, "category": 0}
+
+    def role_named(self, guild: discord.Guild, name: str) -> Optional[discord.Role]:
+        names = self.named_roles.setdefault(guild.id, {})
+        if name in names:
+            self.hits["role"] += 1
+        else:
+            self.misses["role"] += 1
+            role = discord.utils.get(guild.roles, name=name)
+            names[name] = role.id if role else None
+        role_id = names[name]
+        return guild.get_role(role_id) if role_id else None
+
+    def staff_roles(self, guild: discord.Guild) -> list[discord.Role]:
+        """Roles with ban permission, i.e. the moderators that get access to tickets."""
+        role_ids = self.mod_roles.get(guild.id)
+        if role_ids is None:
+            self.misses["mod_roles"] += 1
+            role_ids = self.mod_roles[guild.id] = [role.id for role in guild.roles if role.permissions.ban_members]
+        else:
+            self.hits["mod_roles"] += 1
+        return [role for role in map(guild.get_role, role_ids) if role]
+
+    def category_named(self, guild: discord.Guild, name: str) -> Optional[discord.CategoryChannel]:
+        names = self.categories.setdefault(guild.id, {})
+        if name in names:
+            self.hits["category"] += 1
+        else:
+            self.misses["category"] += 1
+            category = discord.utils.get(guild.categories, name=name)
+            names[name] = category.id if category else None
+        category_id = names[name]
+        return guild.get_channel(category_id) if category_id else None
+
+    # gateway events; each only drops the entries the change could affect
+
+    def role_created(self, role: discord.Role):
+        self.named_roles.get(role.guild.id, {}).pop(role.name, None)
+        if role.permissions.ban_members:
+            self.mod_roles.pop(role.guild.id, None)
+
+    def role_updated(self, before: discord.Role, after: discord.Role):
+        if before.name != after.name:
+            names = self.named_roles.get(after.guild.id, {})
+            names.pop(before.name, None)
+            names.pop(after.name, None)
+        if before.permissions.ban_members != after.permissions.ban_members:
+            self.mod_roles.pop(after.guild.id, None)
+
+    def role_deleted(self, role: discord.Role):
+        self.role_created(role)
+
+    def channel_changed(self, before: discord.abc.GuildChannel, after: Optional[discord.abc.GuildChannel] = None):
+        """Channel created, renamed or deleted (pass the channel as `before` for create/delete)."""
+        names = self.categories.get(before.guild.id)
+        if not names:
+            return
+        for channel in (before, after):
+            if isinstance(channel, discord.CategoryChannel):
+                names.pop(channel.name, None)
+
+    def forget(self, guild_id: int):
+        self.named_roles.pop(guild_id, None)
+        self.mod_roles.pop(guild_id, None)
+        self.categories.pop(guild_id, None)
+
+    def dump(self, guild: discord.Guild) -> dict:
+        hits = sum(self.hits.values())
+        lookups = hits + sum(self.misses.values())
+        return {
+            "named_roles": dict(self.named_roles.get(guild.id, {})),
+            "mod_roles": self.mod_roles.get(guild.id),
+            "categories": dict(self.categories.get(guild.id, {})),
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "guilds_cached": len(set(self.named_roles) | set(self.mod_roles) | set(self.categories)),
+        }
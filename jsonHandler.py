@@ -1,15 +1,26 @@
+import asyncio
 import json
+import logging
 import os
+from typing import Optional
 
 class JsonHandler:
-    def __init__(self, filename: str):
+    log = logging.getLogger("JsonHandler")
+
+    def __init__(self, filename: str, flush_delay: float = 2.0):
         self.filename = filename
+        self.flush_delay = flush_delay
         self.map = {}
+        self.dirty = False
+        self.dirty_keys = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._writing = False
+        self._closing = False
         self.load()
 
     def load(self):
         if not os.path.exists(self.filename):
-            print(f"[JsonHandler] File '{self.filename}' not found. Starting fresh.")
+            self.log.info("File '%s' not found. Starting fresh.", self.filename)
             self.map = {}
             return
 
@@ -18,14 +29,79 @@ class JsonHandler:
                 data = json.load(file)
                 # Ensure keys are integers again (because JSON saves them as strings)
                 self.map = {int(k): v for k, v in data.items()}
-            print(f"[JsonHandler] Successfully loaded data from {self.filename}")
+            self.log.info("Successfully loaded data from %s", self.filename)
         except Exception as e:
-            print(f"[JsonHandler] Failed to load JSON: {e}")
+            self.log.error("Failed to load %s: %s", self.filename, e)
             self.map = {}
 
-    def save(self):
+    def save(self, *keys):
+        # Mark the map dirty; the write happens once per flush_delay no matter how many edits come in.
+        # keys name the entries that changed, for backends that write per row (no keys = anything may have changed)
+        self.dirty = True
+        self.dirty_keys.update(keys or [None])
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no event loop (scripts, shutdown), just write now
+            self.flush()
+            return
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # edits made while a write is in progress get picked up by the next pass
+        while self.dirty and not self._closing:
+            await asyncio.sleep(self.flush_delay)
+            # serialize on the loop so the snapshot is consistent, write on a thread so the loop never waits on disk
+            data = self._serialize()
+            self.dirty = False
+            self.dirty_keys.clear()
+            self._writing = True
+            try:
+                await asyncio.to_thread(self._write, data)
+            except Exception as e:
+                self.log.error("Failed to save %s: %s", self.filename, e)
+                self.dirty = True
+                self.dirty_keys.add(None)
+                return
+            finally:
+                self._writing = False
+
+    def _serialize(self) -> str:
         # Ensure message IDs are saved as strings
         serializable_map = {str(k): v for k, v in self.map.items()}
-        with open(self.filename, "w") as file:
-            json.dump(serializable_map, file, indent=4)
-        print(f"[JsonHandler] Saved to {self.filename}")
+        return json.dumps(serializable_map, separators=(",", ":"))
+
+    def _write(self, data: str):
+        # write to a temp file and swap it in, so a crash mid-write never leaves a truncated file
+        tmp = f"{self.filename}.tmp"
+        os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+        with open(tmp, "w") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, self.filename)
+        self.log.debug("Saved to %s", self.filename)
+
+    def flush(self):
+        if not self.dirty:
+            return
+        self._write(self._serialize())
+        self.dirty = False
+        self.dirty_keys.clear()
+
+    async def close(self):
+        self._closing = True
+        task = self._flush_task
+        if task and not task.done():
+            if self._writing:
+                # let the in-flight write finish rather than racing it on the temp file
+                await asyncio.shield(task)
+            else:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.flush()
@@ -1,35 +1,150 @@
+import time
+
+STARTUP_BEGIN = time.perf_counter()
+
 from typing import Optional
 
 import discord
 from discord import app_commands
 import os
+import logging
+from botLogging import parse_levels, setup_logging
 from jsonHandler import JsonHandler
+from sqliteHandler import MuteSqlite, TicketSqlite
+from guildConfig import GuildConfigCache
+from roleUpdater import RoleUpdateQueue
+from bulkModeration import BulkJob, BulkModerator, parse_user_ids, recent_joins
+from dmOutbox import DmOutbox
+from muteScheduler import MuteScheduler, format_duration, parse_duration
+from reactionIndex import find_emoji
+from reactionReconciler import ReactionReconciler
+from audioExtractor import AudioExtractor
+from musicQueue import GuildQueue, Track
+from trackCache import TrackCache
+from voiceManager import VoiceManager
+from audioCache import LocalAudioCache
+from commandSync import sync_if_changed
+from metrics import metrics, rss_bytes
+from memberCache import MemberCache
+from welcomer import WelcomePipeline
+from ticketRegistry import TicketRegistry, OPEN, ARCHIVED
+from guildResolver import GuildResolver
+from transcripts import TranscriptStore
 from dotenv import load_dotenv, dotenv_values
-import yt_dlp
+import asyncio
 import tempfile
 
 load_dotenv()
 
-MY_GUILD = discord.Object(id=os.environ["GUILD_ID"])  # replace with your guild id
-
-
-class MyClient(discord.Client):
-    def __init__(self, *, intents: discord.Intents):
-        super().__init__(intents=intents)
+# JSON lines on stderr (and LOG_FILE, rotated), written from a background thread.
+# LOG_LEVELS sets levels per subsystem, e.g. "JsonHandler=DEBUG,discord=WARNING"
+log_listener = setup_logging(
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+    levels=parse_levels(os.environ.get("LOG_LEVELS", "")),
+    filename=os.environ.get("LOG_FILE"),
+    max_bytes=int(os.environ.get("LOG_MAX_MB", 10)) * 1024 ** 2,
+    backups=int(os.environ.get("LOG_BACKUPS", 5)),
+)
+log = logging.getLogger("main")
+
+# optional: commands are also synced straight to this guild (global commands can take a while to show up),
+# and the old single-guild save.json is imported into it
+MY_GUILD = discord.Object(id=int(os.environ["GUILD_ID"])) if os.environ.get("GUILD_ID") else None
+# unset lets Discord pick the shard count
+SHARD_COUNT = int(os.environ["SHARD_COUNT"]) if os.environ.get("SHARD_COUNT") else None
+
+# "full" caches every member and receives every gateway event. "lean" drops the intents nothing here uses,
+# doesn't chunk guilds at startup and fetches members on demand through a small LRU instead
+GATEWAY_MODE = os.environ.get("GATEWAY_MODE", "full")
+
+# "json" keeps one folder per guild under DATA_DIR, "sqlite" keeps everything in DB_FILE
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+DB_FILE = os.environ.get("DB_FILE", "bot.db")
+COMMAND_HASH_FILE = os.environ.get("COMMAND_HASH_FILE", ".command_hash")
+
+# time since process start for each milestone (command sync is its own duration)
+startup_timings = {"imports": time.perf_counter() - STARTUP_BEGIN}
+
+
+class MyClient(discord.AutoShardedClient):
+    def __init__(self, *, intents: discord.Intents, shard_count: Optional[int] = None, **options):
+        super().__init__(intents=intents, shard_count=shard_count, **options)
 
         self.tree = app_commands.CommandTree(self)
 
     async def setup_hook(self):
-        self.tree.copy_global_to(guild=MY_GUILD)
-        await self.tree.sync(guild=MY_GUILD)
-
+        started = time.perf_counter()
+        if MY_GUILD:
+            self.tree.copy_global_to(guild=MY_GUILD)
+        # setup_hook runs once per process (on_ready runs on every reconnect), and even then
+        # we only hit the sync endpoints when the command schemas actually changed
+        synced = await sync_if_changed(self.tree, MY_GUILD, COMMAND_HASH_FILE)
+        startup_timings["command sync" if synced else "command sync (skipped)"] = time.perf_counter() - started
+
+        self.add_view(TicketView())  # persistent "open ticket" button
+        self.add_view(CloseTicketView())  # persistent "close ticket" button
+        role_updates.start()
+        unmutes.start()
+        dm_outbox.start()
+        voice_manager.start()
+
+        if os.environ.get("METRICS_PORT"):
+            # prometheus text format, bound to localhost only
+            await metrics.serve(port=int(os.environ["METRICS_PORT"]))
+
+    async def close(self):
+        role_updates.stop()
+        unmutes.stop()
+        # write out anything still waiting on the flush delay first, so a failing teardown step can't lose it
+        for store in (reconcile_checkpoint, guild_configs, ticketHandler, muteHandler):
+            try:
+                await store.close()
+            except Exception:
+                log.exception("Failed to flush %s on shutdown", type(store).__name__)
+
+        # each step runs even if an earlier one fails, and the gateway connection is always closed
+        teardown = [dm_outbox.close(), voice_manager.stop(), asyncio.to_thread(extractor.shutdown)]
+        if local_audio_cache:
+            teardown.append(local_audio_cache.close())
+        try:
+            for step in teardown:
+                try:
+                    await step
+                except Exception:
+                    log.exception("Shutdown step failed")
+        finally:
+            await super().close()
+
+
+if GATEWAY_MODE == "lean":
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.members = True  # join events, for the welcomer and joined_within
+    intents.guild_reactions = True
+    intents.voice_states = True
+    intents.message_content = True  # ticket transcripts read the channel history
+    # keep members in voice (music) and those who joined since startup (raid cleanup), fetch anyone else
+    member_cache_flags = discord.MemberCacheFlags.none()
+    member_cache_flags.voice = True
+    member_cache_flags.joined = True
+    client_options = {
+        "member_cache_flags": member_cache_flags,
+        "chunk_guilds_at_startup": False,
+        "max_messages": None,  # reaction roles use raw events, nothing reads the message cache
+    }
+else:
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.reactions = True
+    intents.guilds = True
+    intents.members = True
+    client_options = {}
+client = MyClient(intents=intents, shard_count=SHARD_COUNT, **client_options)
+metrics.instrument_http(client)
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.reactions = True
-intents.guilds = True
-intents.members = True
-client = MyClient(intents=intents)
+# members the gateway cache doesn't have, fetched on demand
+members = MemberCache()
 
 
 def has_manage_roles():
@@ -46,25 +161,129 @@ def has_ban_perms():
     return app_commands.check(predicate)
 
 
+def has_admin_perms():
+    async def predicate(interaction: discord.Interaction) -> bool:
+        return interaction.user.guild_permissions.administrator
+
+    return app_commands.check(predicate)
+
+
 @client.event
+@metrics.timed("event")
 async def on_ready():
-    await client.tree.sync()
-    client.add_view(TicketView())  # persistent "open ticket" button
-    client.add_view(CloseTicketView())  # persistent "close ticket" button
-    print(f'Logged in as {client.user} (ID: {client.user.id})')
-    print('------')
+    log.info("Logged in as %s (ID: %s) on %s shard(s), %d guilds",
+             client.user, client.user.id, client.shard_count, len(client.guilds))
+    if "ready" not in startup_timings:
+        for guild in client.guilds:
+            removed, adopted = tickets.reconcile(guild)
+            if removed or adopted:
+                log.info("Tickets: dropped %d stale, adopted %d untracked", removed, adopted, extra={"guild": guild.id})
+        startup_timings["ready"] = time.perf_counter() - STARTUP_BEGIN
+        log.info("Startup timings", extra={
+            "startup_ms": {phase: round(seconds * 1000) for phase, seconds in startup_timings.items()},
+            "gateway_mode": GATEWAY_MODE,
+            "rss_mib": round(rss_bytes() / 2 ** 20),
+        })
+    # catch up on reactions made while we were offline (or disconnected); a no-op if a run is still going.
+    # adds only: removals would also strip roles given out by hand, so they're left to /reconcile_reactions
+    reconciler.start(reconciler.guilds_to_check())
+
+
+@client.tree.command(name="stats", description="Show handler latency and API usage.")
+@has_admin_perms()
+@metrics.timed("command", "stats")
+async def stats(interaction: discord.Interaction):
+    configs = guild_configs.stats()
+    embed = discord.Embed(title="Runtime")
+    embed.add_field(name="guild configs loaded", inline=False,
+                    value=f"{configs['loaded']}/{len(client.guilds)} ({configs['load_seconds'] * 1000:.0f} ms)")
+    embed.add_field(name="dm outbox", inline=False,
+                    value=", ".join(f"{name} {value}" for name, value in dm_outbox.stats().items()))
+    embed.add_field(name="voice", inline=False,
+                    value=", ".join(f"{name} {value}" for name, value in voice_manager.stats().items()))
+    embed.add_field(name=f"{GATEWAY_MODE} gateway", inline=False,
+                    value=f"rss {rss_bytes() / 2 ** 20:.0f} MiB, "
+                          f"{sum(len(guild.members) for guild in client.guilds)} cached members")
+    embed.add_field(name="fetched members", inline=False,
+                    value=", ".join(f"{name} {value}" for name, value in members.stats().items()))
+
+    # message content is capped at 2000 characters, code fence included
+    report = metrics.summary(limit=15)
+    if len(report) > 1990:
+        report = report[:report.rfind("\n", 0, 1985)] + "\n..."
+    await interaction.response.send_message(f"```\n{report}\n```", embed=embed, ephemeral=True)
 
 
 # ---------------------------
-# REACTION ROLES
+# GUILD CONFIG
 # ---------------------------
 
-reactionMapHandler = JsonHandler(filename="save.json")
-reaction_role_map = reactionMapHandler.map
+# reaction roles and welcome settings, loaded per guild on first use
+guild_configs = GuildConfigCache(STORAGE_BACKEND, data_dir=DATA_DIR, db_file=DB_FILE)
+guild_configs.migrate_legacy(MY_GUILD.id if MY_GUILD else None)
+
+# roles and channels looked up by name/permission, kept current by the role and channel events below
+resolver = GuildResolver()
+MUTED_ROLE = os.environ.get("MUTED_ROLE", "Muted")
+# optional: ticket channels go under the category with this name, if the guild has one
+TICKET_CATEGORY = os.environ.get("TICKET_CATEGORY")
+
+
+@client.event
+@metrics.timed("event")
+async def on_guild_role_create(role: discord.Role):
+    resolver.role_created(role)
+
+
+@client.event
+@metrics.timed("event")
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    resolver.role_updated(before, after)
+
+
+@client.event
+@metrics.timed("event")
+async def on_guild_role_delete(role: discord.Role):
+    resolver.role_deleted(role)
+
+
+@client.event
+@metrics.timed("event")
+async def on_guild_channel_create(channel: discord.abc.GuildChannel):
+    resolver.channel_changed(channel)
+
+
+@client.event
+@metrics.timed("event")
+async def on_guild_channel_update(before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+    if before.name != after.name:
+        resolver.channel_changed(before, after)
+
+
+@client.event
+@metrics.timed("event")
+async def on_guild_remove(guild: discord.Guild):
+    resolver.forget(guild.id)
+
+
+@client.tree.command(name="resolver", description="Dump the cached role/channel lookups for this server.")
+@has_admin_perms()
+@metrics.timed("command", "resolver")
+async def resolver_state(interaction: discord.Interaction):
+    state = resolver.dump(interaction.guild)
+    lines = [f"{name}: {value}" for name, value in state.items() if name != "hit_rate"]
+    lines.append(f"hit_rate: {state['hit_rate']:.1%}")
+    await interaction.response.send_message("```\n" + "\n".join(lines) + "\n```", ephemeral=True)
+
+
+# ---------------------------
+# REACTION ROLES
+# ---------------------------
 
 
 @client.tree.command(name="add_reaction_role", description="Add a reaction-role mapping from a message.")
 @has_manage_roles()
+@metrics.timed("command", "add_reaction_role")
 async def add_reaction_role(
         interaction: discord.Interaction,
         message_id: str,
@@ -79,11 +298,19 @@ async def add_reaction_role(
         await interaction.response.send_message("Invalid message ID.", ephemeral=True)
         return
 
-    if message_id not in reaction_role_map:
-        reaction_role_map[message_id] = {}
+    config = guild_configs.get(interaction.guild.id)
+    if message_id not in config.reaction_roles:
+        config.reaction_roles[message_id] = {}
+
+    # the same emoji may already be mapped under an older name
+    old_emoji = find_emoji(config.reaction_roles[message_id], emoji)
+    if old_emoji:
+        del config.reaction_roles[message_id][old_emoji]
 
-    reaction_role_map[message_id][emoji] = role.id
-    reactionMapHandler.save()
+    config.reaction_roles[message_id][emoji] = role.id
+    config.reaction_index.add(message_id, emoji, role.id)
+    config.reaction_handler.save(message_id)
+    config.set_message_channel(message_id, interaction.channel.id)
 
     # Try to react to the message
     try:
@@ -105,6 +332,7 @@ async def add_reaction_role(
 
 @client.tree.command(name="remove_reaction_role", description="Remove a reaction-role mapping from a message.")
 @has_manage_roles()
+@metrics.timed("command", "remove_reaction_role")
 async def remove_reaction_role(
         interaction: discord.Interaction,
         message_id: str,
@@ -116,17 +344,21 @@ async def remove_reaction_role(
         await interaction.response.send_message("Invalid message ID.", ephemeral=True)
         return
 
-    mapping = reaction_role_map.get(message_id_int)
-    if not mapping or emoji not in mapping:
+    config = guild_configs.get(interaction.guild.id)
+    mapping = config.reaction_roles.get(message_id_int)
+    stored_emoji = find_emoji(mapping, emoji) if mapping else None
+    if not stored_emoji:
         await interaction.response.send_message("❌ No such reaction-role mapping found.", ephemeral=True)
         return
 
     # Remove mapping
-    del reaction_role_map[message_id_int][emoji]
-    if not reaction_role_map[message_id_int]:  # clean up empty dicts
-        del reaction_role_map[message_id_int]
+    del config.reaction_roles[message_id_int][stored_emoji]
+    if not config.reaction_roles[message_id_int]:  # clean up empty dicts
+        del config.reaction_roles[message_id_int]
+        config.forget_message_channel(message_id_int)
+    config.reaction_index.remove(message_id_int, stored_emoji)
 
-    reactionMapHandler.save()
+    config.reaction_handler.save(message_id_int)
 
     # Try to remove the reaction
     try:
@@ -141,32 +373,78 @@ async def remove_reaction_role(
                                             ephemeral=True)
 
 
+# Reaction bursts go through a per-member queue, so several clicks turn into one roles edit
+role_updates = RoleUpdateQueue(
+    client,
+    members,
+    window=float(os.environ.get("ROLE_UPDATE_WINDOW", 1.5)),
+    max_pending=int(os.environ.get("ROLE_UPDATE_MAX_PENDING", 2000)),
+)
+
+
 @client.event
+@metrics.timed("event")
 async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
-    if payload.message_id in reaction_role_map:
-        guild = client.get_guild(payload.guild_id)
-        member = guild.get_member(payload.user_id)
-        emoji = str(payload.emoji)
-
-        role_id = reaction_role_map[payload.message_id].get(emoji)
-        if role_id and member and member != client.user:
-            role = guild.get_role(role_id)
-            if role:
-                await member.add_roles(role)
+    if not payload.guild_id or payload.user_id == client.user.id:
+        return
+    config = guild_configs.get(payload.guild_id)
+    role_id = config.reaction_index.lookup(payload.message_id, payload.emoji)
+    if role_id:
+        if payload.message_id not in config.message_channels:
+            config.set_message_channel(payload.message_id, payload.channel_id)
+        await role_updates.submit(payload.guild_id, payload.user_id, role_id, add=True)
 
 
 @client.event
+@metrics.timed("event")
 async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
-    if payload.message_id in reaction_role_map:
-        guild = client.get_guild(payload.guild_id)
-        member = guild.get_member(payload.user_id)
-        emoji = str(payload.emoji)
+    if not payload.guild_id or payload.user_id == client.user.id:
+        return
+    config = guild_configs.get(payload.guild_id)
+    role_id = config.reaction_index.lookup(payload.message_id, payload.emoji)
+    if role_id:
+        if payload.message_id not in config.message_channels:
+            config.set_message_channel(payload.message_id, payload.channel_id)
+        await role_updates.submit(payload.guild_id, payload.user_id, role_id, add=False)
+
+
+# re-applies reactions made while the bot was offline, on ready and on demand
+reconcile_checkpoint = JsonHandler(os.path.join(DATA_DIR, "reconcile_checkpoint.json"))
+reconciler = ReactionReconciler(
+    client,
+    guild_configs,
+    role_updates,
+    reconcile_checkpoint,
+    concurrency=int(os.environ.get("RECONCILE_CONCURRENCY", 3)),
+)
+
+
+@client.tree.command(name="reconcile_reactions", description="Re-sync reaction roles with the reactions on their messages.")
+@app_commands.describe(remove_stale="Also take the role from members who hold it without reacting (including hand-assigned ones)")
+@has_manage_roles()
+@metrics.timed("command", "reconcile_reactions")
+async def reconcile_reactions(interaction: discord.Interaction, remove_stale: bool = False):
+    if reconciler.running and not reconciler.running.done():
+        await interaction.response.send_message("A reconcile is already running, try again once it's done.",
+                                                ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    stats = await reconciler.start([interaction.guild], remove=remove_stale)
+    if not (stats["messages"] or stats["missing_messages"] or stats["failed_messages"] or stats["failed_guilds"]):
+        await interaction.followup.send("No reaction roles to reconcile.", ephemeral=True)
+        return
+    await interaction.followup.send("\n".join(f"{name}: {value}" for name, value in stats.items()), ephemeral=True)
 
-        role_id = reaction_role_map[payload.message_id].get(emoji)
-        if role_id and member and member != client.user:
-            role = guild.get_role(role_id)
-            if role:
-                await member.remove_roles(role)
+
+@client.tree.command(name="role_queue", description="Show reaction-role update queue stats.")
+@has_manage_roles()
+@metrics.timed("command", "role_queue")
+async def role_queue(interaction: discord.Interaction):
+    stats = role_updates.stats()
+    await interaction.response.send_message(
+        "\n".join(f"{name}: {value}" for name, value in stats.items()),
+        ephemeral=True
+    )
 
 
 @client.tree.error
@@ -180,43 +458,78 @@ async def on_app_command_error(interaction: discord.Interaction, error: app_comm
         raise error  # Re-raise unhandled exceptions
 
 
+# moderation notices go out in the background, so commands respond without waiting on a DM round trip
+dm_outbox = DmOutbox(client, max_queue=int(os.environ.get("DM_OUTBOX_SIZE", 1000)))
+
+
 @client.tree.command(name="warn", description="Warns a user.")
 @has_ban_perms()
+@metrics.timed("command", "warn")
 async def warn(
         interaction: discord.Interaction,
         user: discord.User,
         message: str
 ):
-    try:
-        await user.send(f"⚠️ You have been warned in **{interaction.guild.name}** for: {message}")
-    except discord.Forbidden:
-        print("❌ Could not DM the user. They may have DMs closed.")
-
+    dm_outbox.send(user.id, f"⚠️ You have been warned in **{interaction.guild.name}** for: {message}")
     await interaction.response.send_message(f"✅ {user.mention} has been warned for: `{message}`", ephemeral=False)
 
 
+# timed mutes; one background task lifts them as they expire, and pending ones survive restarts
+if STORAGE_BACKEND == "sqlite":
+    muteHandler = MuteSqlite(DB_FILE)
+else:
+    muteHandler = JsonHandler("mutes.json")
+unmutes = MuteScheduler(client, muteHandler, members)
+
+
+def mute_duration(duration: Optional[str]) -> tuple[bool, Optional[int]]:
+    """(valid, seconds); no duration means a mute until lifted by hand."""
+    if not duration:
+        return True, None
+    seconds = parse_duration(duration)
+    return seconds is not None, seconds
+
+
 @client.tree.command(name="mute", description="Mutes a user by assigning a 'Muted' role.")
+@app_commands.describe(duration="How long, e.g. 30m, 2h or 1d12h. Leave empty to mute until unmuted by hand")
 @has_ban_perms()
+@metrics.timed("command", "mute")
 async def mute(
         interaction: discord.Interaction,
         user: discord.Member,  # note: must be Member to modify roles
-        message: str
+        message: str,
+        duration: Optional[str] = None
 ):
-    muted_role = discord.utils.get(interaction.guild.roles, name="Muted")
+    valid, seconds = mute_duration(duration)
+    if not valid:
+        await interaction.response.send_message("❌ Invalid duration. Use e.g. 30m, 2h or 1d12h.", ephemeral=True)
+        return
+
+    muted_role = resolver.role_named(interaction.guild, MUTED_ROLE)
     if not muted_role:
-        await interaction.response.send_message("❌ 'Muted' role not found. Please create one first.", ephemeral=True)
+        await interaction.response.send_message(f"❌ '{MUTED_ROLE}' role not found. Please create one first.",
+                                                ephemeral=True)
         return
 
+    length = f" for {format_duration(seconds)}" if seconds else ""
     try:
         await user.add_roles(muted_role, reason=message)
-        await user.send(f"🔇 You have been muted in **{interaction.guild.name}** for: {message}")
-        await interaction.response.send_message(f"✅ {user.mention} has been muted for: `{message}`", ephemeral=False)
     except discord.Forbidden:
         await interaction.response.send_message("❌ I do not have permission to mute this user.", ephemeral=True)
+        return
+
+    if seconds:
+        unmutes.schedule(interaction.guild.id, user.id, muted_role.id, seconds)
+    else:
+        unmutes.cancel(interaction.guild.id, user.id)
+    await interaction.response.send_message(f"✅ {user.mention} has been muted{length} for: `{message}`",
+                                            ephemeral=False)
+    dm_outbox.send(user.id, f"🔇 You have been muted in **{interaction.guild.name}**{length} for: {message}")
 
 
 @client.tree.command(name="ban", description="Bans a user.")
 @has_ban_perms()
+@metrics.timed("command", "ban")
 async def ban(
         interaction: discord.Interaction,
         user: discord.User,
@@ -224,22 +537,139 @@ async def ban(
 ):
     try:
         await interaction.guild.ban(user, reason=message)
-        await interaction.response.send_message(f"✅ {user.mention} has been banned for: `{message}`", ephemeral=False)
-
-        try:
-            await user.send(f"⛔ You have been banned from **{interaction.guild.name}** for: {message}")
-        except discord.Forbidden:
-            pass  # user may have DMs closed
     except discord.Forbidden:
         await interaction.response.send_message("❌ I do not have permission to ban this user.", ephemeral=True)
+        return
+
+    await interaction.response.send_message(f"✅ {user.mention} has been banned for: `{message}`", ephemeral=False)
+    dm_outbox.send(user.id, f"⛔ You have been banned from **{interaction.guild.name}** for: {message}")
+
+
+# Bulk versions for raids. Targets are a list of ids/mentions and/or everyone who joined in the last N minutes
+bulk_moderator = BulkModerator(dm_outbox, workers=int(os.environ.get("BULK_MOD_WORKERS", 5)))
+
+
+def bulk_targets(interaction: discord.Interaction, user_ids: Optional[str], joined_within: Optional[int]) -> list[int]:
+    targets = parse_user_ids(user_ids) if user_ids else []
+    if joined_within:
+        targets += [user_id for user_id in recent_joins(interaction.guild, joined_within) if user_id not in targets]
+    # never act on ourselves or on the moderator running the command
+    return [user_id for user_id in targets if user_id not in (client.user.id, interaction.user.id)]
+
+
+async def run_bulk(interaction: discord.Interaction, action: str, targets: list[int], work):
+    """Post a progress message, run work(job, report) and replace the progress with the summary."""
+    if not targets:
+        await interaction.response.send_message("❌ No users matched. Give user IDs or `joined_within`.",
+                                                ephemeral=True)
+        return
+
+    await interaction.response.defer(thinking=True)
+    job = BulkJob(action, len(targets))
+    progress = await interaction.followup.send(job.progress(), wait=True)
+    await work(job, lambda job: progress.edit(content=job.progress()))
+    await progress.edit(content=job.summary())
+
+
+@client.tree.command(name="bulk_warn", description="Warns a list of users, or everyone who joined recently.")
+@app_commands.describe(user_ids="User IDs or mentions, separated by spaces or commas",
+                       joined_within="Also warn members who joined in the last N minutes")
+@has_ban_perms()
+@metrics.timed("command", "bulk_warn")
+async def bulk_warn(
+        interaction: discord.Interaction,
+        message: str,
+        user_ids: Optional[str] = None,
+        joined_within: Optional[app_commands.Range[int, 1, 1440]] = None
+):
+    text = f"⚠️ You have been warned in **{interaction.guild.name}** for: {message}"
+
+    async def work(job, report):
+        # a warning is just the DM, so it's done once the outbox has it; delivery is logged from there
+        for user_id in targets:
+            bulk_moderator.notify(job, user_id, text)
+        job.done = job.dms_queued
+        job.skipped = job.total - job.done
+
+    targets = bulk_targets(interaction, user_ids, joined_within)
+    await run_bulk(interaction, "Warn", targets, work)
+
+
+@client.tree.command(name="bulk_mute", description="Mutes a list of users, or everyone who joined recently.")
+@app_commands.describe(user_ids="User IDs or mentions, separated by spaces or commas",
+                       joined_within="Also mute members who joined in the last N minutes",
+                       duration="How long, e.g. 30m, 2h or 1d12h. Leave empty to mute until unmuted by hand",
+                       dm="DM each muted user the reason")
+@has_ban_perms()
+@metrics.timed("command", "bulk_mute")
+async def bulk_mute(
+        interaction: discord.Interaction,
+        message: str,
+        user_ids: Optional[str] = None,
+        joined_within: Optional[app_commands.Range[int, 1, 1440]] = None,
+        duration: Optional[str] = None,
+        dm: bool = True
+):
+    valid, seconds = mute_duration(duration)
+    if not valid:
+        await interaction.response.send_message("❌ Invalid duration. Use e.g. 30m, 2h or 1d12h.", ephemeral=True)
+        return
+
+    guild = interaction.guild
+    muted_role = resolver.role_named(guild, MUTED_ROLE)
+    if not muted_role:
+        await interaction.response.send_message(f"❌ '{MUTED_ROLE}' role not found. Please create one first.",
+                                                ephemeral=True)
+        return
+    length = f" for {format_duration(seconds)}" if seconds else ""
+    text = f"🔇 You have been muted in **{guild.name}**{length} for: {message}"
+
+    async def work(job, report):
+        async def mute_one(user_id: int) -> bool:
+            member = await members.get(guild, user_id)
+            if member is None or muted_role in member.roles:
+                return False
+            await member.add_roles(muted_role, reason=message)
+            if seconds:
+                unmutes.schedule(guild.id, user_id, muted_role.id, seconds)
+            if dm:
+                bulk_moderator.notify(job, user_id, text)
+            return True
+
+        await bulk_moderator.run(job, targets, mute_one, report)
+
+    targets = bulk_targets(interaction, user_ids, joined_within)
+    await run_bulk(interaction, f"Mute{length}", targets, work)
+
+
+@client.tree.command(name="bulk_ban", description="Bans a list of users, or everyone who joined recently.")
+@app_commands.describe(user_ids="User IDs or mentions, separated by spaces or commas",
+                       joined_within="Also ban members who joined in the last N minutes")
+@has_ban_perms()
+@metrics.timed("command", "bulk_ban")
+async def bulk_ban(
+        interaction: discord.Interaction,
+        message: str,
+        user_ids: Optional[str] = None,
+        joined_within: Optional[app_commands.Range[int, 1, 1440]] = None
+):
+    async def work(job, report):
+        await bulk_moderator.ban(job, interaction.guild, targets, message, report=report)
+
+    targets = bulk_targets(interaction, user_ids, joined_within)
+    await run_bulk(interaction, "Ban", targets, work)
 
 
 # ---------------------------
 # WELCOMER
 # ---------------------------
 
-welcomeHandler = JsonHandler("welcome.json")
-welcome_config = welcomeHandler.map
+# Templates are parsed once per guild; join floods above the threshold get welcomed in batches
+welcomer = WelcomePipeline(
+    lambda guild_id: guild_configs.get(guild_id).welcome,
+    batch_threshold=int(os.environ.get("WELCOME_BATCH_THRESHOLD", 10)),  # joins per minute
+    batch_interval=float(os.environ.get("WELCOME_BATCH_INTERVAL", 5)),
+)
 
 
 class WelcomeMessageModal(discord.ui.Modal, title="Set Welcome Message"):
@@ -271,8 +701,9 @@ class WelcomeMessageModal(discord.ui.Modal, title="Set Welcome Message"):
         self.add_item(self.color_input)
         self.add_item(self.gif_input)
 
+    @metrics.timed("modal", "WelcomeMessageModal")
     async def on_submit(self, interaction: discord.Interaction):
-        guild_id = str(interaction.guild.id)
+        guild_id = interaction.guild.id
 
         # Parse color
         color_hex = self.color_input.value.strip() or "#00ffff"
@@ -292,13 +723,13 @@ class WelcomeMessageModal(discord.ui.Modal, title="Set Welcome Message"):
         message = self.message_input.value
 
         # Save config
-        welcome_config[guild_id] = {
+        guild_configs.get(guild_id).set_welcome({
             "channel_id": self.channel.id,
             "message": message,
             "color": color.value,
             "gif_url": gif_url
-        }
-        welcomeHandler.save()
+        })
+        welcomer.invalidate(guild_id)
 
         # Build and send embed
         preview = message.replace("{user}", interaction.user.mention)
@@ -319,112 +750,196 @@ class WelcomeMessageModal(discord.ui.Modal, title="Set Welcome Message"):
 
 @client.tree.command(name="welcome", description="Set up the welcome message with embed.")
 @has_ban_perms()
+@metrics.timed("command", "welcome")
 async def welcome(interaction: discord.Interaction, channel: discord.TextChannel):
     await interaction.response.send_modal(WelcomeMessageModal(channel))
 
 
 @client.event
+@metrics.timed("event")
 async def on_member_join(member: discord.Member):
-    guild_id = str(member.guild.id)
-    config = welcome_config.get(guild_id)
-    if not config:
-        return
+    await welcomer.submit(member)
 
-    channel = member.guild.get_channel(config["channel_id"])
-    if not channel:
-        return
 
-    color = discord.Color(config.get("color", 0x00FFFF))
-    message = config.get("message", "Welcome {user}!").replace("{user}", member.mention)
-    gif_url = config.get("gif_url")
+# ---------------------------
+# MUSIC
+# ---------------------------
+
+extractor = AudioExtractor(
+    max_workers=int(os.environ.get("YTDLP_WORKERS", 2)),
+    timeout=float(os.environ.get("YTDLP_TIMEOUT", 30)),
+    cache=TrackCache(
+        max_size=int(os.environ.get("TRACK_CACHE_SIZE", 512)),
+        filename=os.environ.get("TRACK_CACHE_FILE"),  # unset = memory only
+    ),
+)
+
+# hot tracks get downloaded and kept as Opus on disk; leave AUDIO_CACHE_DIR unset to always stream
+local_audio_cache = None
+if os.environ.get("AUDIO_CACHE_DIR"):
+    local_audio_cache = LocalAudioCache(
+        os.environ["AUDIO_CACHE_DIR"],
+        max_bytes=int(os.environ.get("AUDIO_CACHE_MAX_MB", 2048)) * 1024 ** 2,
+        promote_after=int(os.environ.get("AUDIO_CACHE_PROMOTE_AFTER", 3)),
+    )
 
-    embed = discord.Embed(description=message, color=color)
-    if gif_url:
-        embed.set_image(url=gif_url)
+PLAYBACK_MODE = os.environ.get("PLAYBACK_MODE", "auto")  # see musicQueue.PLAYBACK_MODES
 
-    try:
-        await channel.send(embed=embed)
-    except discord.Forbidden:
-        pass
+audio_state: dict[int, GuildQueue] = {}  # guild id -> queue
 
 
-# ---------------------------
-# MUSIC
-# ---------------------------
+def get_queue(guild: discord.Guild) -> GuildQueue:
+    queue = audio_state.get(guild.id)
+    if queue is None:
+        queue = GuildQueue(
+            guild.id, extractor, client.loop, local_cache=local_audio_cache, playback_mode=PLAYBACK_MODE
+        )
+        audio_state[guild.id] = queue
+    return queue
+
+
+def drop_audio_state(guild_id: int):
+    # clear first so the player's after callback doesn't start the next track
+    queue = audio_state.pop(guild_id, None)
+    if queue:
+        queue.clear()
+
+
+voice_manager = VoiceManager(
+    client,
+    drop_audio_state,
+    idle_timeout=float(os.environ.get("VOICE_IDLE_TIMEOUT", 300)),
+    empty_timeout=float(os.environ.get("VOICE_EMPTY_TIMEOUT", 30)),
+)
 
-audio_state = {}
+
+@client.event
+@metrics.timed("event")
+async def on_voice_state_update(member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+    # kicked from voice or the channel was deleted; the voice client is already gone
+    if member.id == client.user.id and before.channel and after.channel is None:
+        voice_manager.forget(member.guild.id)
 
 
 # Join command
 @client.tree.command(name="join", description="Bot joins your voice channel.")
+@metrics.timed("command", "join")
 async def join(interaction: discord.Interaction):
     if not interaction.user.voice or not interaction.user.voice.channel:
         await interaction.response.send_message("❌ You must be in a voice channel.", ephemeral=True)
         return
 
     channel = interaction.user.voice.channel
-    await channel.connect()
+    await voice_manager.connect(channel)
     await interaction.response.send_message(f"✅ Joined {channel.name}", ephemeral=True)
 
 
 # Play command
 @client.tree.command(name="play", description="Stream audio from a YouTube or Spotify link.")
 @app_commands.describe(url="YouTube or Spotify URL")
+@metrics.timed("command", "play")
 async def play(interaction: discord.Interaction, url: str):
     await interaction.response.defer(thinking=True, ephemeral=False)
 
     voice = interaction.guild.voice_client
-    if not voice:
+    if not voice or not voice.is_connected():
         if not interaction.user.voice or not interaction.user.voice.channel:
             await interaction.followup.send("❌ You must be in a voice channel.", ephemeral=True)
             return
-        voice = await interaction.user.voice.channel.connect()
-
-    ytdlp_opts = {
-        'format': 'bestaudio/best',
-        'quiet': True,
-        'no_warnings': True,
-        'default_search': 'auto',
-        'source_address': '0.0.0.0',  # IPv6 issues workaround
-    }
+        voice = await voice_manager.connect(interaction.user.voice.channel)
+    voice_manager.touch(interaction.guild.id)
 
-    with yt_dlp.YoutubeDL(ytdlp_opts) as ydl:
+    # hot tracks already on disk don't need a stream url at all
+    local_title = local_audio_cache.title_for(url) if local_audio_cache else None
+    if local_title:
+        track = Track(url, local_title, requested_by=interaction.user.id)
+    else:
+        # never extract past the point where the followup token is no longer valid
+        remaining = (interaction.expires_at - discord.utils.utcnow()).total_seconds()
         try:
-            info = ydl.extract_info(url, download=False)
-            audio_url = info['url']
-            title = info.get('title', 'Unknown Title')
+            info = await extractor.extract(url, timeout=remaining)
+        except asyncio.TimeoutError:
+            if not interaction.is_expired():
+                await interaction.followup.send("❌ Timed out while extracting audio.", ephemeral=True)
+            return
         except Exception as e:
             await interaction.followup.send(f"❌ Failed to extract audio: {e}", ephemeral=True)
             return
+        track = Track.from_info(url, info, requested_by=interaction.user.id)
+    title = track.title
+
+    queue = get_queue(interaction.guild)
+    queue.channel = interaction.channel
+    position = await queue.enqueue(track, voice)
+
+    if position == 0:
+        await interaction.followup.send(f"🎧 Now streaming: **{title}**", ephemeral=False)
+    else:
+        await interaction.followup.send(f"➕ Queued **{title}** at position {position}", ephemeral=False)
+
+
+# Skip command
+@client.tree.command(name="skip", description="Skip the current track.")
+@metrics.timed("command", "skip")
+async def skip(interaction: discord.Interaction):
+    queue = audio_state.get(interaction.guild.id)
+    if not queue or not queue.skip():
+        await interaction.response.send_message("❌ Nothing is playing.", ephemeral=True)
+        return
+
+    await interaction.response.send_message("⏭️ Skipped.", ephemeral=False)
 
-    # Stream via FFmpeg
-    ffmpeg_options = {
-        'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
-        'options': '-vn'
-    }
 
-    source = discord.FFmpegPCMAudio(audio_url, **ffmpeg_options)
-    voice.play(source, after=lambda e: print(f"Finished playing: {e}"))
+# Queue command
+@client.tree.command(name="queue", description="Show the music queue.")
+@metrics.timed("command", "queue")
+async def show_queue(interaction: discord.Interaction):
+    queue = audio_state.get(interaction.guild.id)
+    if not queue or (queue.current is None and not queue.tracks):
+        await interaction.response.send_message("📭 The queue is empty.", ephemeral=True)
+        return
+
+    lines = []
+    if queue.current:
+        lines.append(f"🎧 **{queue.current.title}**")
+    for i, track in enumerate(list(queue.tracks)[:10], start=1):
+        lines.append(f"`{i}.` {track.title}")
+    if len(queue.tracks) > 10:
+        lines.append(f"...and {len(queue.tracks) - 10} more")
 
-    await interaction.followup.send(f"🎧 Now streaming: **{title}**", ephemeral=False)
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+
+# Cache stats command
+@client.tree.command(name="music_cache", description="Show track cache hit rate.")
+@has_manage_roles()
+@metrics.timed("command", "music_cache")
+async def music_cache(interaction: discord.Interaction):
+    stats = extractor.cache.stats()
+    message = (
+        f"📦 {stats['size']}/{stats['max_size']} tracks cached\n"
+        f"hits: {stats['hits']} | misses: {stats['misses']} | hit rate: {stats['hit_rate']:.0%}\n"
+        f"avg extraction: {stats['avg_miss_seconds']:.2f}s | time saved: ~{stats['saved_seconds']:.0f}s"
+    )
+    if local_audio_cache:
+        disk = local_audio_cache.stats()
+        message += (
+            f"\n💾 {disk['files']} tracks on disk, {disk['bytes'] / 1024 ** 2:.0f}/{disk['max_bytes'] / 1024 ** 2:.0f} MB"
+            f" ({disk['downloading']} downloading)"
+        )
+    await interaction.response.send_message(message, ephemeral=True)
 
 
 # Stop command
 @client.tree.command(name="stop", description="Stop audio and leave voice.")
+@metrics.timed("command", "stop")
 async def stop(interaction: discord.Interaction):
     voice = interaction.guild.voice_client
     if not voice:
         await interaction.response.send_message("❌ I'm not connected.", ephemeral=True)
         return
 
-    # Stop playback
-    voice.stop()
-    await voice.disconnect()
-
-    # Clean up
-    filepath = audio_state.pop(interaction.guild.id, None)
-    if filepath and os.path.exists(filepath):
-        os.remove(filepath)
+    await voice_manager.disconnect(interaction.guild, f"/stop by {interaction.user.id}")
 
     await interaction.response.send_message("⏹️ Stopped and disconnected.", ephemeral=True)
 
@@ -433,9 +948,22 @@ async def stop(interaction: discord.Interaction):
 # TICKETS
 # ---------------------------
 
+if STORAGE_BACKEND == "sqlite":
+    ticketHandler = TicketSqlite(DB_FILE)
+else:
+    ticketHandler = JsonHandler("tickets.json")
+tickets = TicketRegistry(ticketHandler, create_concurrency=int(os.environ.get("TICKET_CREATE_CONCURRENCY", 2)))
+
+transcripts = TranscriptStore(os.environ.get("TRANSCRIPT_DIR", "transcripts"))
+# archived ticket channels are deleted once their transcript is saved; set to 0 to keep them around
+DELETE_ARCHIVED_TICKETS = os.environ.get("DELETE_ARCHIVED_TICKETS", "1") == "1"
+exporting_transcripts: set[int] = set()  # ticket channel ids with an export in progress
+
+
 class TicketModal(discord.ui.Modal, title="Create Ticket Embed"):
     embed_description = discord.ui.TextInput(label="Embed Description", style=discord.TextStyle.paragraph)
 
+    @metrics.timed("modal", "TicketModal")
     async def on_submit(self, interaction: discord.Interaction):
         embed = discord.Embed(
             description=self.embed_description.value,
@@ -454,6 +982,7 @@ class CloseWithReasonModal(discord.ui.Modal, title="Close Ticket with Reason"):
         max_length=400
     )
 
+    @metrics.timed("modal", "CloseWithReasonModal")
     async def on_submit(self, interaction: discord.Interaction):
         await archive_ticket(interaction, reason=self.reason.value)
 
@@ -464,19 +993,27 @@ class CloseTicketView(discord.ui.View):
         super().__init__(timeout=None)
 
     @discord.ui.button(label="close", style=discord.ButtonStyle.red, custom_id="close_ticket")
+    @metrics.timed("button", "close_ticket")
     async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
         await archive_ticket(interaction, reason="Closed by moderator")
 
     @discord.ui.button(label="close with reason", style=discord.ButtonStyle.gray, custom_id="close_ticket_reason")
+    @metrics.timed("button", "close_ticket_reason")
     async def close_ticket_reason(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.send_modal(CloseWithReasonModal())
 
     @discord.ui.button(label="claim", style=discord.ButtonStyle.blurple, custom_id="claim_ticket")
+    @metrics.timed("button", "claim_ticket")
     async def claim_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not interaction.channel.name.startswith("ticket-"):
+        ticket = tickets.get(interaction.channel.id)
+        if not ticket:
             await interaction.response.send_message("❌ This is not a ticket channel.", ephemeral=True)
             return
+        if ticket["state"] != OPEN:
+            await interaction.response.send_message(f"❌ This ticket is already {ticket['state']}.", ephemeral=True)
+            return
 
+        tickets.claim(interaction.channel.id, interaction.user.id)
         await interaction.channel.edit(name=f"{interaction.channel.name}-claimed")
         await interaction.channel.send(f"🔒 Ticket claimed by {interaction.user.mention}")
 
@@ -489,30 +1026,28 @@ class TicketView(discord.ui.View):
         super().__init__(timeout=None)
 
     @discord.ui.button(label="open ticket", style=discord.ButtonStyle.green, custom_id="open_ticket")
+    @metrics.timed("button", "open_ticket")
     async def open_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
         guild = interaction.guild
         user = interaction.user
 
-        existing = discord.utils.get(guild.text_channels, name=f"ticket-{user.name.lower().replace(' ', '-')}")
-        if existing:
-            await interaction.response.send_message("❌ You already have a ticket open!", ephemeral=True)
-            return
+        with tickets.opening_ticket(guild.id, user.id) as allowed:
+            # double clicks and clicks while the first channel is still being created land here
+            if not allowed:
+                await interaction.response.send_message("❌ You already have a ticket open!", ephemeral=True)
+                return
 
-        # Permissions setup
-        overwrites = {
-            guild.default_role: discord.PermissionOverwrite(view_channel=False),
-            user: discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True),
-        }
+            # the wait for a creation slot can outlast the 3 second response window
+            await interaction.response.defer(ephemeral=True, thinking=True)
 
-        mod_roles = [role for role in guild.roles if role.permissions.ban_members]
-        for role in mod_roles:
-            overwrites[role] = discord.PermissionOverwrite(view_channel=True, send_messages=True)
-
-        ticket_channel = await guild.create_text_channel(
-            name=f"ticket-{user.name}".lower(),
-            overwrites=overwrites,
-            reason="New support ticket"
-        )
+            async with tickets.creation_slot(guild.id):
+                ticket_channel = await guild.create_text_channel(
+                    name=f"ticket-{user.name}".lower(),
+                    overwrites=tickets.overwrites_for(guild, user, resolver.staff_roles(guild)),
+                    category=resolver.category_named(guild, TICKET_CATEGORY) if TICKET_CATEGORY else None,
+                    reason="New support ticket"
+                )
+                tickets.create(guild.id, ticket_channel.id, user.id)
 
         embed = discord.Embed(
             description=
@@ -527,53 +1062,120 @@ class TicketView(discord.ui.View):
 
         await ticket_channel.send(content=f"{user.mention}", embed=embed, view=CloseTicketView())
 
-        await interaction.response.send_message(f"✅ Ticket created: {ticket_channel.mention}", ephemeral=True)
+        await interaction.followup.send(f"✅ Ticket created: {ticket_channel.mention}", ephemeral=True)
+
+
+@client.event
+@metrics.timed("event")
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    # ticket channels deleted by hand shouldn't keep their owner locked out of opening a new one
+    tickets.remove(channel.id)
+    resolver.channel_changed(channel)
 
 
 @client.tree.command(name="create_ticket_message", description="Create a ticket embed with a button.")
 @has_ban_perms()
+@metrics.timed("command", "create_ticket_message")
 async def create_ticket_message(interaction: discord.Interaction):
     await interaction.response.send_modal(TicketModal())
 
 
 @client.tree.command(name="close_ticket", description="Close the current ticket channel.")
+@metrics.timed("command", "close_ticket")
 async def close_ticket_cmd(interaction: discord.Interaction):
     await close_ticket(interaction)
 
 
 async def close_ticket(interaction: discord.Interaction):
-    if not interaction.channel.name.startswith("ticket-"):
+    if not tickets.get(interaction.channel.id):
         await interaction.response.send_message("❌ This is not a ticket channel.", ephemeral=True)
         return
 
     await interaction.response.send_message("🗑️ Closing this ticket...", ephemeral=True)
     await interaction.channel.delete(reason="Ticket closed")
+    tickets.remove(interaction.channel.id)
 
 
 async def archive_ticket(interaction: discord.Interaction, reason: str):
-    if not interaction.channel.name.startswith("ticket-"):
+    ticket = tickets.get(interaction.channel.id)
+    if not ticket:
         await interaction.response.send_message("❌ This is not a ticket channel.", ephemeral=True)
         return
+    path = transcripts.path_for(interaction.guild.id, ticket["owner_id"], interaction.channel.id)
+    if ticket["state"] == ARCHIVED and os.path.exists(path):
+        await interaction.response.send_message("❌ This ticket is already archived.", ephemeral=True)
+        return
+    if interaction.channel.id in exporting_transcripts:
+        await interaction.response.send_message("⏳ The transcript is already being saved.", ephemeral=True)
+        return
+    # archived without a transcript means the last export failed; closing again only retries the export
+    retry = ticket["state"] == ARCHIVED
+
+    exporting_transcripts.add(interaction.channel.id)
+    try:
+        if not retry:
+            overwrites = interaction.channel.overwrites
+            # Update permissions to make the channel read-only for the user (a Member, or an Object if they aren't cached)
+            for target in overwrites:
+                if target.id == ticket["owner_id"]:
+                    overwrites[target] = discord.PermissionOverwrite(view_channel=True, send_messages=False)
+                    break
+            tickets.archive(interaction.channel.id)
+
+        # exporting a long ticket takes a while
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        if not retry:
+            await interaction.channel.edit(
+                name=f"{interaction.channel.name}-archived",
+                overwrites=overwrites,
+                reason=reason
+            )
+            await interaction.channel.send(f"🗃️ This ticket has been archived.\n**Reason**: {reason}")
 
-    overwrites = interaction.channel.overwrites
-    # Update permissions to make the channel read-only for the user
-    ticket_owner = None
-    for target, perms in overwrites.items():
-        if isinstance(target, discord.Member) and perms.view_channel and not target.bot:
-            ticket_owner = target
-            break
-
-    if ticket_owner:
-        overwrites[ticket_owner] = discord.PermissionOverwrite(view_channel=True, send_messages=False)
-
-    await interaction.channel.edit(
-        name=f"{interaction.channel.name}-archived",
-        overwrites=overwrites,
-        reason=reason
+        try:
+            count = await transcripts.export(interaction.channel, path)
+        except (discord.HTTPException, OSError) as e:
+            await interaction.followup.send(
+                f"✅ Ticket archived, but saving the transcript failed: {e}\nClose the ticket again to retry.",
+                ephemeral=True
+            )
+            return
+    finally:
+        exporting_transcripts.discard(interaction.channel.id)
+
+    if not DELETE_ARCHIVED_TICKETS:
+        await interaction.followup.send(f"✅ Ticket archived. Transcript saved ({count} messages).", ephemeral=True)
+        return
+
+    await interaction.followup.send(
+        f"✅ Ticket archived. Transcript saved ({count} messages), deleting the channel.", ephemeral=True
     )
+    await interaction.channel.delete(reason=f"Ticket archived: {reason}")
+
 
-    await interaction.channel.send(f"🗃️ This ticket has been archived.\n**Reason**: {reason}")
-    await interaction.response.send_message("✅ Ticket archived.", ephemeral=True)
+@client.tree.command(name="transcript", description="Fetch a user's archived ticket transcripts.")
+@has_ban_perms()
+@metrics.timed("command", "transcript")
+async def transcript(interaction: discord.Interaction, user_id: str):
+    try:
+        owner_id = int(user_id)
+    except ValueError:
+        await interaction.response.send_message("Invalid user ID.", ephemeral=True)
+        return
+
+    paths = transcripts.list_for(interaction.guild.id, owner_id)
+    if not paths:
+        await interaction.response.send_message("📭 No transcripts found for that user.", ephemeral=True)
+        return
+
+    # attachments per message are capped at 10
+    files = [discord.File(path) for path in paths[:10]]
+    await interaction.response.send_message(
+        f"🗃️ {len(paths)} transcript(s) for <@{owner_id}>" + (", showing the 10 newest." if len(paths) > 10 else "."),
+        files=files,
+        ephemeral=True
+    )
 
 
 # ---------------------------
@@ -582,6 +1184,7 @@ async def archive_ticket(interaction: discord.Interaction, reason: str):
 
 @client.tree.command(name="say", description="make tamako say sum")
 @has_ban_perms()
+@metrics.timed("command", "say")
 async def say(interaction: discord.Interaction):
     await interaction.response.send_modal(SayModal())
 
@@ -607,6 +1210,7 @@ class SayModal(discord.ui.Modal, title="make tamako say sum"):
         required=False
     )
 
+    @metrics.timed("modal", "SayModal")
     async def on_submit(self, interaction: discord.Interaction):
         # Default color: #D5B9BA
         try:
@@ -630,4 +1234,9 @@ class SayModal(discord.ui.Modal, title="make tamako say sum"):
 # RUN
 # ---------------------------
 
-client.run(os.environ["TOKEN"])
+startup_timings["module loaded"] = time.perf_counter() - STARTUP_BEGIN
+
+if __name__ == "__main__":
+    # discord.py's own logger already goes through the queue set up above
+    client.run(os.environ["TOKEN"], log_handler=None)
+    log_listener.stop()
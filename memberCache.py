@@ -0,0 +1,38 @@
+from typing import Optional
+
+import discord
+
+
+class MemberCache:
+    """
+    Member lookups that don't rely on the gateway having chunked the guild. guild.get_member is tried
+    first (the gateway keeps those copies current); on a miss the member is fetched over REST. Fetched
+    members aren't kept: every caller goes on to write roles based on the member's current ones, so a
+    stored copy would only be a way to act on stale data.
+    """
+
+    def __init__(self):
+        self.gateway_hits = 0
+        self.fetches = 0
+        self.not_found = 0
+
+    async def get(self, guild: discord.Guild, user_id: int) -> Optional[discord.Member]:
+        """The member, or None if they aren't in the guild."""
+        member = guild.get_member(user_id)
+        if member is not None:
+            self.gateway_hits += 1
+            return member
+
+        self.fetches += 1
+        try:
+            return await guild.fetch_member(user_id)
+        except discord.NotFound:
+            self.not_found += 1
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "gateway_hits": self.gateway_hits,
+            "fetches": self.fetches,
+            "not_found": self.not_found,
+        }
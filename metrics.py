@@ -0,0 +1,183 @@
+import asyncio
+import functools
+import logging
+import os
+import resource
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Optional
+
+import discord
+
+from botLogging import log_context
+
+log = logging.getLogger("Metrics")
+
+# upper bounds in seconds, prometheus-style; the last bucket catches everything slower
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+
+def _log_context(kind: str, label: str, args: tuple) -> dict:
+    # who and where a handler is running for, so every record it logs can say so
+    context = {"event" if kind == "event" else "command": label}
+    for arg in args:
+        if isinstance(arg, discord.Interaction):
+            context.update(guild=arg.guild_id, user=arg.user.id)
+        elif isinstance(arg, discord.Member):
+            context.update(guild=arg.guild.id, user=arg.id)
+        elif hasattr(arg, "guild_id") and hasattr(arg, "user_id"):  # raw gateway payloads
+            context.update(guild=arg.guild_id, user=arg.user_id)
+        else:
+            continue
+        break
+    return context
+
+
+def rss_bytes() -> int:
+    """Current resident set size; peak RSS where /proc isn't available."""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if error:
+            self.errors += 1
+
+    def percentile(self, q: float) -> float:
+        """Estimate the q-th quantile (0..1), interpolating linearly inside the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if BUCKETS[i] != float("inf") else lower * 2
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return BUCKETS[-2]
+
+
+class Metrics:
+    def __init__(self):
+        self.handlers: dict[tuple[str, str], Histogram] = defaultdict(Histogram)  # (kind, name) -> latency
+        self.api_calls: dict[str, int] = defaultdict(int)  # "METHOD /route" -> count
+        self.started = time.time()
+
+    def observe(self, kind: str, name: str, seconds: float, error: bool = False):
+        self.handlers[(kind, name)].observe(seconds, error)
+
+    def timed(self, kind: str, name: Optional[str] = None):
+        """Decorator for coroutine handlers (commands, events, buttons) that records latency and errors."""
+        def decorator(func):
+            label = name or func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                token = log_context.set(_log_context(kind, label, args))
+                error = False
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    seconds = time.perf_counter() - started
+                    self.observe(kind, label, seconds, error)
+                    log.debug("%s %s done", kind, label, extra={"duration_ms": round(seconds * 1000, 2), "error": error})
+                    log_context.reset(token)
+
+            return wrapper
+
+        return decorator
+
+    def instrument_http(self, client: discord.Client):
+        """Count every REST call the client makes, by route."""
+        http = client.http
+        request = http.request
+
+        @functools.wraps(request)
+        async def counted_request(route, **kwargs):
+            self.api_calls[f"{route.method} {route.path}"] += 1
+            return await request(route, **kwargs)
+
+        http.request = counted_request
+
+    def summary(self, limit: int = 20) -> str:
+        rows = sorted(self.handlers.items(), key=lambda item: item[1].count, reverse=True)[:limit]
+        lines = [f"{'handler':<32}{'calls':>7}{'err':>5}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}"]
+        for (kind, name), hist in rows:
+            lines.append(
+                f"{(kind + ':' + name)[:31]:<32}{hist.count:>7}{hist.errors:>5}"
+                f"{hist.percentile(0.5) * 1000:>8.0f}{hist.percentile(0.95) * 1000:>8.0f}"
+                f"{hist.percentile(0.99) * 1000:>8.0f}"
+            )
+        total_api = sum(self.api_calls.values())
+        uptime = max(time.time() - self.started, 1)
+        lines.append("")
+        lines.append(f"discord api calls: {total_api} ({total_api / uptime * 60:.1f}/min)")
+        for route, count in sorted(self.api_calls.items(), key=lambda item: item[1], reverse=True)[:5]:
+            lines.append(f"  {count:>6}  {route}")
+        return "\n".join(lines)
+
+    def prometheus(self) -> str:
+        lines = [
+            "# TYPE utilsbot_handler_seconds histogram",
+        ]
+        for (kind, name), hist in self.handlers.items():
+            labels = f'kind="{kind}",name="{name}"'
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, hist.counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'utilsbot_handler_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"utilsbot_handler_seconds_sum{{{labels}}} {hist.total}")
+            lines.append(f"utilsbot_handler_seconds_count{{{labels}}} {hist.count}")
+        lines.append("# TYPE utilsbot_handler_errors_total counter")
+        for (kind, name), hist in self.handlers.items():
+            lines.append(f'utilsbot_handler_errors_total{{kind="{kind}",name="{name}"}} {hist.errors}')
+        lines.append("# TYPE utilsbot_api_calls_total counter")
+        for route, count in self.api_calls.items():
+            lines.append(f'utilsbot_api_calls_total{{route="{route}"}} {count}')
+        lines.append("# TYPE utilsbot_resident_memory_bytes gauge")
+        lines.append(f"utilsbot_resident_memory_bytes {rss_bytes()}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9100) -> asyncio.AbstractServer:
+        """Serve the prometheus text format on http://host:port/metrics (any path works)."""
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                # we don't care about the request beyond reading it off the socket
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                body = self.prometheus().encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: text/plain; version=0.0.4\r\n"
+                    + f"Content-Length: {len(body)}\r\n".encode()
+                    + b"Connection: close\r\n\r\n"
+                    + body
+                )
+                await writer.drain()
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+
+metrics = Metrics()
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+import discord
+
+from audioCache import LocalAudioCache
+from audioExtractor import AudioExtractor
+
+log = logging.getLogger("GuildQueue")
+
+FFMPEG_OPTIONS = {
+    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
+    'options': '-vn'
+}
+
+# "auto": pass opus streams through untouched and let ffmpeg encode anything else to opus
+# "pcm": the old path, ffmpeg decodes to PCM and discord.py encodes opus in the player thread
+PLAYBACK_MODES = ("auto", "pcm")
+
+
+def make_source(audio_url: str, acodec: Optional[str], mode: str = "auto",
+                options: Optional[dict] = None) -> discord.AudioSource:
+    options = FFMPEG_OPTIONS if options is None else options
+    if mode == "pcm":
+        return discord.FFmpegPCMAudio(audio_url, **options)
+    if acodec == "opus":
+        return discord.FFmpegOpusAudio(audio_url, codec="copy", **options)
+    return discord.FFmpegOpusAudio(audio_url, **options)
+
+
+class Track:
+    def __init__(self, url: str, title: str, audio_url: Optional[str] = None, expires_at: float = 0.0,
+                 acodec: Optional[str] = None, requested_by: Optional[int] = None):
+        self.url = url
+        self.title = title
+        self.audio_url = audio_url
+        self.expires_at = expires_at
+        self.acodec = acodec
+        self.requested_by = requested_by
+
+    @classmethod
+    def from_info(cls, url: str, info: dict, requested_by: Optional[int] = None) -> "Track":
+        return cls(url, info['title'], info['url'], info['expires_at'], info.get('acodec'), requested_by=requested_by)
+
+    def is_fresh(self) -> bool:
+        # signed stream urls expire, so a track queued long ago gets re-resolved before it plays
+        return self.audio_url is not None and time.time() < self.expires_at
+
+    async def resolve(self, extractor: AudioExtractor):
+        info = await extractor.extract(self.url)
+        self.audio_url = info['url']
+        self.title = info['title']
+        self.expires_at = info['expires_at']
+        self.acodec = info.get('acodec')
+
+
+class GuildQueue:
+    def __init__(self, guild_id: int, extractor: AudioExtractor, loop: asyncio.AbstractEventLoop,
+                 local_cache: Optional[LocalAudioCache] = None, playback_mode: str = "auto"):
+        self.guild_id = guild_id
+        self.extractor = extractor
+        self.local_cache = local_cache
+        self.playback_mode = playback_mode
+        self.loop = loop
+        self.tracks: deque[Track] = deque()
+        self.current: Optional[Track] = None
+        self.voice: Optional[discord.VoiceClient] = None
+        self.channel: Optional[discord.abc.Messageable] = None
+        self.prefetch_task: Optional[asyncio.Task] = None
+        self.play_lock = asyncio.Lock()
+        self.stopped = False
+
+    async def enqueue(self, track: Track, voice: discord.VoiceClient) -> int:
+        """Add a track and start playback if idle. Returns the queue position (0 = playing now)."""
+        self.voice = voice
+        self.stopped = False
+        self.tracks.append(track)
+        if self.current is None and not voice.is_playing():
+            await self._play_next()
+            if self.current is track:
+                return 0
+        self._prefetch()
+        return len(self.tracks)
+
+    def skip(self) -> bool:
+        if self.voice is None or not (self.voice.is_playing() or self.voice.is_paused()):
+            return False
+        # stopping the player fires the after callback, which advances the queue
+        self.voice.stop()
+        return True
+
+    def clear(self):
+        self.stopped = True
+        self.tracks.clear()
+        self.current = None
+        if self.prefetch_task and not self.prefetch_task.done():
+            self.prefetch_task.cancel()
+        self.prefetch_task = None
+        if self.voice and (self.voice.is_playing() or self.voice.is_paused()):
+            self.voice.stop()
+
+    def _prefetch(self):
+        if not self.tracks or self.tracks[0].is_fresh():
+            return
+        if self.local_cache and self.local_cache.lookup(self.tracks[0].url):
+            return
+        if self.prefetch_task and not self.prefetch_task.done():
+            return
+        self.prefetch_task = self.loop.create_task(self._resolve_quietly(self.tracks[0]))
+
+    async def _resolve_quietly(self, track: Track):
+        try:
+            await track.resolve(self.extractor)
+        except Exception as e:
+            # _play_next retries once and skips the track if that fails too
+            log.warning("Prefetch failed for %s: %s", track.url, e, extra={"guild": self.guild_id})
+
+    async def _play_next(self):
+        async with self.play_lock:
+            if self.current is not None or (self.voice and self.voice.is_playing()):
+                return
+
+            while self.tracks and not self.stopped:
+                track = self.tracks.popleft()
+
+                local_path = self.local_cache.lookup(track.url) if self.local_cache else None
+
+                if self.prefetch_task and not self.prefetch_task.done():
+                    await asyncio.wait({self.prefetch_task})
+                if not local_path and not track.is_fresh():
+                    try:
+                        await track.resolve(self.extractor)
+                    except Exception as e:
+                        log.warning("Skipping %s: %s", track.url, e, extra={"guild": self.guild_id})
+                        continue
+
+                if self.stopped or self.voice is None or not self.voice.is_connected():
+                    break
+
+                self.current = track
+                if local_path:
+                    # already 48 kHz Opus on disk, so ffmpeg only has to remux it
+                    source = discord.FFmpegOpusAudio(local_path, codec="copy")
+                else:
+                    source = make_source(track.audio_url, track.acodec, self.playback_mode)
+                self.voice.play(source, after=self._after)
+                if self.local_cache and not local_path:
+                    self.local_cache.record_play(track.url, track.title)
+                self._prefetch()
+                return
+
+            self.current = None
+
+    def _after(self, error: Optional[Exception]):
+        # runs on the voice player thread
+        if error:
+            log.error("Player error: %s", error, extra={"guild": self.guild_id})
+        self.current = None
+        if not self.stopped:
+            asyncio.run_coroutine_threadsafe(self._advance(), self.loop)
+
+    async def _advance(self):
+        had_next = bool(self.tracks)
+        await self._play_next()
+        if had_next and self.current and self.channel:
+            try:
+                await self.channel.send(f"🎧 Now streaming: **{self.current.title}**")
+            except discord.HTTPException:
+                pass
@@ -0,0 +1,167 @@
+import asyncio
+import heapq
+import logging
+import re
+import time
+from typing import Optional
+
+import discord
+
+from jsonHandler import JsonHandler
+from memberCache import MemberCache
+
+log = logging.getLogger("MuteScheduler")
+
+DURATION_RE = re.compile(r"(\d+)\s*([smhdw])")
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+MAX_DURATION = 365 * 86400
+
+
+def parse_duration(text: str) -> Optional[int]:
+    """'90s', '30m', '1d12h' -> seconds; a bare number means minutes. None if it doesn't parse."""
+    text = text.strip().lower()
+    if text.isdigit():
+        seconds = int(text) * 60
+    else:
+        parts = DURATION_RE.findall(text)
+        if not parts or DURATION_RE.sub("", text).strip():
+            return None
+        seconds = sum(int(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+    return seconds if 0 < seconds <= MAX_DURATION else None
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    parts = []
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60), ("s", 1)):
+        if seconds >= size:
+            parts.append(f"{seconds // size}{unit}")
+            seconds %= size
+    return " ".join(parts) or "0s"
+
+
+class MuteScheduler:
+    """
+    Pending unmutes, persisted through handler as {guild_id: {user_id: {"role_id", "expires_at"}}}.
+    A heap ordered by expiry drives one background task, which sleeps until the next deadline and then
+    lifts every mute that is due in a single pass. Cancelled or extended mutes leave a stale heap entry
+    behind that is skipped when it comes up.
+    """
+
+    def __init__(self, client: discord.Client, handler: JsonHandler, members: MemberCache, concurrency: int = 5,
+                 retry_delay: float = 60):
+        self.client = client
+        self.members = members
+        self.handler = handler
+        self.concurrency = concurrency
+        self.retry_delay = retry_delay
+        self.mutes = handler.map
+        for guild_id, users in self.mutes.items():
+            # json hands the inner user ids back as strings
+            self.mutes[guild_id] = {int(user_id): entry for user_id, entry in users.items()}
+        self.heap = [
+            (entry["expires_at"], guild_id, user_id)
+            for guild_id, users in self.mutes.items() for user_id, entry in users.items()
+        ]
+        heapq.heapify(self.heap)
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.unmuted = 0
+        self.failed = 0
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    def schedule(self, guild_id: int, user_id: int, role_id: int, duration: float) -> float:
+        expires_at = time.time() + duration
+        self.mutes.setdefault(guild_id, {})[user_id] = {"role_id": role_id, "expires_at": expires_at}
+        heapq.heappush(self.heap, (expires_at, guild_id, user_id))
+        self.handler.save(guild_id)
+        if self.heap[0][0] == expires_at:
+            self.wakeup.set()  # new earliest deadline, the sleeper has to recompute
+        return expires_at
+
+    def cancel(self, guild_id: int, user_id: int):
+        users = self.mutes.get(guild_id)
+        if users and users.pop(user_id, None):
+            if not users:
+                del self.mutes[guild_id]
+            self.handler.save(guild_id)
+
+    def expires_at(self, guild_id: int, user_id: int) -> Optional[float]:
+        entry = self.mutes.get(guild_id, {}).get(user_id)
+        return entry["expires_at"] if entry else None
+
+    def pending(self, guild_id: Optional[int] = None) -> int:
+        if guild_id is not None:
+            return len(self.mutes.get(guild_id, {}))
+        return sum(len(users) for users in self.mutes.values())
+
+    async def _run(self):
+        # before ready get_guild returns None for everything, which would look like we left every guild
+        await self.client.wait_until_ready()
+        while True:
+            self.wakeup.clear()
+            timeout = self.heap[0][0] - time.time() if self.heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due()
+            if due:
+                await self._lift(due)
+
+    def _pop_due(self) -> list[tuple[int, int, int, float]]:
+        now = time.time()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            expires_at, guild_id, user_id = heapq.heappop(self.heap)
+            entry = self.mutes.get(guild_id, {}).get(user_id)
+            if entry and entry["expires_at"] == expires_at:
+                due.append((guild_id, user_id, entry["role_id"], expires_at))
+        return due
+
+    async def _lift(self, due: list[tuple[int, int, int, float]]):
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def lift_one(guild_id: int, user_id: int, role_id: int, expires_at: float):
+            async with slots:
+                try:
+                    await self._unmute(guild_id, user_id, role_id)
+                    self.unmuted += 1
+                except discord.Forbidden:
+                    self.failed += 1
+                    log.warning("No permission to unmute %s", user_id, extra={"guild": guild_id, "user": user_id})
+                except discord.HTTPException as e:
+                    # try again later rather than leaving them muted forever
+                    if self.expires_at(guild_id, user_id) == expires_at:
+                        log.warning("Failed to unmute %s, retrying: %s", user_id, e, extra={"guild": guild_id, "user": user_id})
+                        self.schedule(guild_id, user_id, role_id, self.retry_delay)
+                    return
+
+            # a new mute may have been scheduled while the request was in flight
+            if self.expires_at(guild_id, user_id) == expires_at:
+                self.cancel(guild_id, user_id)
+
+        await asyncio.gather(*(lift_one(*item) for item in due))
+
+    async def _unmute(self, guild_id: int, user_id: int, role_id: int):
+        guild = self.client.get_guild(guild_id)
+        if guild is None:
+            return  # no longer in that guild
+        role = guild.get_role(role_id)
+        if role is None:
+            return
+        member = await self.members.get(guild, user_id)
+        if member is None:
+            return  # left; the role went with them
+        if role in member.roles:
+            await member.remove_roles(role, reason="Mute expired")
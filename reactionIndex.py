@@ -0,0 +1,60 @@
+from typing import Optional, Union
+
+import discord
+
+EmojiKey = Union[int, str]
+
+
+def emoji_key(emoji: discord.PartialEmoji) -> EmojiKey:
+    # custom emojis are identified by id (names can be renamed), unicode ones by their codepoints
+    if emoji.id:
+        return emoji.id
+    return emoji.name.replace("\ufe0f", "")
+
+
+def emoji_key_from_str(text: str) -> EmojiKey:
+    return emoji_key(discord.PartialEmoji.from_str(text.strip()))
+
+
+def find_emoji(mapping: dict, text: str) -> Optional[str]:
+    """Return the stored emoji string in mapping that refers to the same emoji as text, if any."""
+    key = emoji_key_from_str(text)
+    for stored in mapping:
+        if emoji_key_from_str(stored) == key:
+            return stored
+    return None
+
+
+class ReactionRoleIndex:
+    """Flat (message id, emoji key) -> role id view of reaction_role_map, for the raw reaction handlers."""
+
+    def __init__(self):
+        self.roles: dict[tuple[int, EmojiKey], int] = {}
+        self.messages: dict[int, int] = {}  # message id -> number of mappings on it
+
+    def build(self, reaction_role_map: dict):
+        self.roles.clear()
+        self.messages.clear()
+        for message_id, mapping in reaction_role_map.items():
+            for emoji, role_id in mapping.items():
+                self.add(message_id, emoji, role_id)
+
+    def add(self, message_id: int, emoji: str, role_id: int):
+        key = (message_id, emoji_key_from_str(emoji))
+        if key not in self.roles:
+            self.messages[message_id] = self.messages.get(message_id, 0) + 1
+        self.roles[key] = role_id
+
+    def remove(self, message_id: int, emoji: str):
+        key = (message_id, emoji_key_from_str(emoji))
+        if self.roles.pop(key, None) is None:
+            return
+        self.messages[message_id] -= 1
+        if not self.messages[message_id]:
+            del self.messages[message_id]
+
+    def lookup(self, message_id: int, emoji: discord.PartialEmoji) -> Optional[int]:
+        # reactions on any other message are rejected before the emoji is even looked at
+        if message_id not in self.messages:
+            return None
+        return self.roles.get((message_id, emoji_key(emoji)))
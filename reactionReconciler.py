@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import AsyncIterator, Iterator, Optional
+
+import discord
+
+from guildConfig import GuildConfig, GuildConfigCache
+from jsonHandler import JsonHandler
+from reactionIndex import emoji_key, emoji_key_from_str
+from roleUpdater import RoleUpdateQueue
+
+log = logging.getLogger("ReactionReconciler")
+
+
+class ReactionReconciler:
+    """
+    Catches reaction roles up with reactions added or removed while the bot wasn't listening.
+
+    The holders of each guild's mapped roles are listed once per run (one pass over the member list when
+    the guild isn't chunked). For every mapped (message, emoji) the reactors, streamed from reaction.users
+    by ascending user id, are merge-joined against the role's holders in the same order: reactors without
+    the role get it. With remove=True, holders who no longer react lose it; that's opt-in because it
+    also takes back roles handed out by hand. Changes go through the role update queue, like live
+    reactions. Progress is checkpointed per message as {message_id: {"guild_id", "done": [emoji], "emoji",
+    "after"}}, so an interrupted run picks up where it stopped.
+    """
+
+    def __init__(self, client: discord.Client, guild_configs: GuildConfigCache, role_updates: RoleUpdateQueue,
+                 checkpoint: JsonHandler, concurrency: int = 3):
+        self.client = client
+        self.guild_configs = guild_configs
+        self.role_updates = role_updates
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.running: Optional[asyncio.Task] = None
+        self.last_run: Counter = Counter()
+
+    def start(self, guilds: list[discord.Guild], remove: bool = False) -> asyncio.Task:
+        """Reconcile these guilds in the background; if a run is already going, returns that one."""
+        if self.running is None or self.running.done():
+            self.running = asyncio.create_task(self.run(guilds, remove))
+        return self.running
+
+    def guilds_to_check(self) -> list[discord.Guild]:
+        guild_ids = set(self.guild_configs.guilds_with_reaction_roles())
+        guild_ids.update(guild_id for guild_id, config in self.guild_configs.configs.items() if config.reaction_roles)
+        return [guild for guild in map(self.client.get_guild, guild_ids) if guild is not None]
+
+    async def run(self, guilds: list[discord.Guild], remove: bool = False) -> Counter:
+        started = time.perf_counter()
+        stats = Counter()
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def one(guild: discord.Guild, config: GuildConfig, holders: dict[int, list[int]], message_id: int):
+            async with slots:
+                try:
+                    await self._reconcile_message(guild, config, holders, message_id, remove, stats)
+                except discord.HTTPException as e:
+                    stats["failed_messages"] += 1
+                    log.warning("Message %s failed: %s", message_id, e, extra={"guild": guild.id})
+
+        jobs = []
+        for guild in guilds:
+            config = self.guild_configs.get(guild.id)
+            if not config.reaction_roles:
+                continue
+            try:
+                holders = await self._role_holders(guild, config)
+            except discord.HTTPException as e:
+                stats["failed_guilds"] += 1
+                log.warning("Listing members failed: %s", e, extra={"guild": guild.id})
+                continue
+            jobs.extend(one(guild, config, holders, message_id) for message_id in list(config.reaction_roles))
+        await asyncio.gather(*jobs)
+
+        stats["seconds"] = round(time.perf_counter() - started, 1)
+        self.last_run = stats
+        log.info("Reconciled %d guilds", len(guilds), extra=dict(stats))
+        return stats
+
+    async def _reconcile_message(self, guild: discord.Guild, config: GuildConfig, holders: dict[int, list[int]],
+                                 message_id: int, remove: bool, stats: Counter):
+        message = await self._fetch_message(guild, config, message_id)
+        if message is None:
+            stats["missing_messages"] += 1
+            return
+
+        progress = self.checkpoint.map.setdefault(message_id, {"guild_id": guild.id, "done": []})
+        # a role mapped in several places may be held because of another reaction, so it's never taken away here
+        role_uses = Counter(role_id for mapping in config.reaction_roles.values() for role_id in mapping.values())
+
+        for emoji, role_id in list(config.reaction_roles.get(message_id, {}).items()):
+            if emoji in progress["done"]:
+                continue
+            after = progress["after"] if progress.get("emoji") == emoji else 0
+            progress.update(emoji=emoji, after=after)
+            await self._reconcile_emoji(guild, message, emoji, role_id, holders.get(role_id, []), progress,
+                                        remove and role_uses[role_id] == 1, stats)
+            progress["done"].append(emoji)
+            progress.update(emoji=None, after=0)
+            self.checkpoint.save(message_id)
+
+        stats["messages"] += 1
+        del self.checkpoint.map[message_id]
+        self.checkpoint.save(message_id)
+
+    async def _fetch_message(self, guild: discord.Guild, config: GuildConfig,
+                             message_id: int) -> Optional[discord.Message]:
+        channel_id = config.message_channels.get(message_id)
+        channels = [guild.get_channel(channel_id)] if channel_id else guild.text_channels
+        for channel in channels:
+            if channel is None:
+                continue
+            try:
+                message = await channel.fetch_message(message_id)
+            except (discord.NotFound, discord.Forbidden):
+                continue
+            # mappings made before channels were recorded are found by trying each channel once
+            config.set_message_channel(message_id, channel.id)
+            return message
+        return None
+
+    async def _reconcile_emoji(self, guild: discord.Guild, message: discord.Message, emoji: str, role_id: int,
+                               role_holders: list[int], progress: dict, allow_remove: bool, stats: Counter):
+        if guild.get_role(role_id) is None:
+            return
+
+        key = emoji_key_from_str(emoji)
+        reaction = next((r for r in message.reactions if self._reaction_key(r) == key), None)
+        reactors = self._reactors(reaction, progress["after"])
+        holders: Iterator[int] = (member_id for member_id in role_holders if member_id > progress["after"])
+
+        holder = next(holders, None)
+        async for user_id in reactors:
+            stats["reactions_scanned"] += 1
+            while holder is not None and holder < user_id:
+                await self._drop(guild, holder, role_id, allow_remove, stats)
+                holder = next(holders, None)
+            if holder == user_id:
+                holder = next(holders, None)
+            else:
+                stats["added"] += 1
+                await self.role_updates.submit(guild.id, user_id, role_id, add=True)
+            # everything up to this id is settled on both sides
+            progress["after"] = user_id
+            self.checkpoint.save(message.id)
+
+        while holder is not None:
+            await self._drop(guild, holder, role_id, allow_remove, stats)
+            progress["after"] = holder
+            self.checkpoint.save(message.id)
+            holder = next(holders, None)
+
+    async def _drop(self, guild: discord.Guild, user_id: int, role_id: int, allow_remove: bool, stats: Counter):
+        if allow_remove:
+            stats["removed"] += 1
+            await self.role_updates.submit(guild.id, user_id, role_id, add=False)
+        else:
+            stats["kept_without_reaction"] += 1
+
+    @staticmethod
+    def _reaction_key(reaction: discord.Reaction):
+        emoji = reaction.emoji
+        return emoji_key(discord.PartialEmoji.from_str(emoji) if isinstance(emoji, str) else emoji)
+
+    async def _reactors(self, reaction: Optional[discord.Reaction], after: int) -> AsyncIterator[int]:
+        if reaction is None:
+            return
+        async for user in reaction.users(limit=None, after=discord.Object(id=after) if after else None):
+            if not user.bot:
+                yield user.id
+
+    async def _role_holders(self, guild: discord.Guild, config: GuildConfig) -> dict[int, list[int]]:
+        """{role id: holder ids in ascending order} for every role mapped in this guild, bots left out."""
+        role_ids = {role_id for mapping in config.reaction_roles.values() for role_id in mapping.values()}
+        holders: dict[int, list[int]] = {role_id: [] for role_id in role_ids}
+        if guild.chunked:
+            for role_id in role_ids:
+                role = guild.get_role(role_id)
+                if role is not None:
+                    holders[role_id] = sorted(member.id for member in role.members if not member.bot)
+            return holders
+        # lean gateway: no full member cache, so one pass over the member list covers every mapped role
+        async for member in guild.fetch_members(limit=None):
+            if member.bot:
+                continue
+            for role in member.roles:
+                if role.id in holders:
+                    holders[role.id].append(member.id)
+        for member_ids in holders.values():
+            member_ids.sort()
+        return holders
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+
+import discord
+
+from memberCache import MemberCache
+
+log = logging.getLogger("RoleUpdateQueue")
+
+
+class RoleUpdateQueue:
+    """
+    Collects reaction-role add/remove intents per member for a short window and applies the net
+    change with a single member.edit(roles=...) call.
+    """
+
+    def __init__(self, client: discord.Client, members: MemberCache, window: float = 1.5, max_pending: int = 2000,
+                 workers: int = 2, max_retries: int = 5):
+        self.client = client
+        self.members = members
+        self.window = window
+        self.workers = workers
+        self.max_retries = max_retries
+        self.pending: dict[tuple[int, int], dict[int, bool]] = {}  # (guild id, member id) -> {role id: add?}
+        self.ready: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.tasks: list[asyncio.Task] = []
+        self.inflight: set[tuple[int, int]] = set()
+        self.backoff_until = 0.0
+
+        self.counts: dict[tuple[int, int], int] = {}  # raw intents folded into each pending entry
+        self.intents = 0
+        self.resolved = 0  # intents that went through _apply, whether or not they needed a call
+        self.api_calls = 0
+        self.noops = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    def start(self):
+        for _ in range(self.workers):
+            self.tasks.append(asyncio.create_task(self._worker()))
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks.clear()
+
+    async def submit(self, guild_id: int, member_id: int, role_id: int, add: bool):
+        self.intents += 1
+        key = (guild_id, member_id)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        intents = self.pending.get(key)
+        if intents is not None:
+            # the latest intent for a role wins, so add-then-remove inside the window cancels out
+            intents[role_id] = add
+            return
+
+        self.pending[key] = {role_id: add}
+        # waits here when the queue is full, which slows the gateway handlers instead of growing without bound
+        await self.ready.put((time.monotonic() + self.window, key, 0))
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.ready.qsize(),
+            "pending_members": len(self.pending),
+            "intents": self.intents,
+            "api_calls": self.api_calls,
+            "api_calls_saved": self.resolved - self.api_calls,
+            "noops": self.noops,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed,
+        }
+
+    async def _worker(self):
+        while True:
+            due, key, attempt = await self.ready.get()
+            try:
+                delay = max(due, self.backoff_until) - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if key in self.inflight:
+                    # another worker is mid-edit for this member; its cached roles are stale until that lands
+                    try:
+                        self.ready.put_nowait((time.monotonic() + self.window, key, attempt))
+                    except asyncio.QueueFull:
+                        self.pending.pop(key, None)
+                        self.counts.pop(key, None)
+                        raise
+                    continue
+                self.inflight.add(key)
+                try:
+                    await self._apply(key, attempt)
+                finally:
+                    self.inflight.discard(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                log.error("Failed to update roles: %s", e, extra={"guild": key[0], "user": key[1]})
+            finally:
+                self.ready.task_done()
+
+    async def _apply(self, key: tuple[int, int], attempt: int):
+        intents = self.pending.pop(key, None)
+        if not intents:
+            return
+        count = self.counts.pop(key, 0)
+
+        guild_id, member_id = key
+        guild = self.client.get_guild(guild_id)
+        if guild is None:
+            return
+        # the edit replaces the whole role list, so it has to start from the member's current roles
+        member = await self.members.get(guild, member_id)
+        if member is None:
+            return
+
+        self.resolved += count
+        current = {role.id for role in member.roles if not role.is_default()}
+        desired = set(current)
+        for role_id, add in intents.items():
+            if guild.get_role(role_id) is None:
+                continue  # role was deleted since the mapping was made
+            if add:
+                desired.add(role_id)
+            else:
+                desired.discard(role_id)
+
+        if desired == current:
+            self.noops += 1
+            return
+
+        try:
+            self.api_calls += 1
+            await member.edit(roles=[discord.Object(id=role_id) for role_id in desired], reason="Reaction roles")
+        except discord.HTTPException as e:
+            if e.status != 429 or attempt >= self.max_retries:
+                raise
+            self.rate_limited += 1
+            # pause every worker, then put the intents back (anything newer that came in meanwhile wins)
+            backoff = min(2 ** attempt, 60)
+            self.backoff_until = time.monotonic() + backoff
+            self.resolved -= count
+            self.pending[key] = {**intents, **self.pending.get(key, {})}
+            self.counts[key] = self.counts.get(key, 0) + count
+            try:
+                self.ready.put_nowait((self.backoff_until, key, attempt + 1))
+            except asyncio.QueueFull:
+                self.pending.pop(key, None)
+                self.counts.pop(key, None)
+                raise
@@ -0,0 +1,226 @@
+import logging
+import sqlite3
+import threading
+from typing import Optional
+
+from jsonHandler import JsonHandler
+
+
+def connect(filename: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(filename, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SqliteHandler(JsonHandler):
+    """
+    Drop-in for JsonHandler backed by a SQLite table. The map is still loaded into memory, but
+    save(key) only rewrites that key's rows instead of the whole store.
+
+    Tables with a partition_column can be opened for a single guild: only that guild's rows are
+    loaded and written, and many such handlers can share one connection.
+    """
+    log = logging.getLogger("SqliteHandler")
+    table = ""
+    key_column = ""
+    partition_column = None
+    columns = ()
+    schema = ""
+
+    # SQLite only has one writer at a time anyway; this keeps handlers sharing a connection out of each other's transactions
+    write_lock = threading.Lock()
+
+    def __init__(self, filename: str, flush_delay: float = 2.0, guild_id: Optional[int] = None,
+                 conn: Optional[sqlite3.Connection] = None):
+        self.guild_id = guild_id
+        self.owns_conn = conn is None
+        if conn is None:
+            conn = connect(filename)
+            self.prepare(conn)
+        self.conn = conn
+        super().__init__(filename, flush_delay)
+
+    @classmethod
+    def prepare(cls, conn: sqlite3.Connection):
+        """Create the table (and bring older layouts up to date). Callers sharing a connection run this once."""
+        conn.executescript(cls.schema)
+
+    def to_rows(self, key, value) -> list:
+        raise NotImplementedError
+
+    def from_row(self, row: tuple):
+        """Fold one row into self.map."""
+        raise NotImplementedError
+
+    def _where(self) -> tuple[str, tuple]:
+        if self.guild_id is None:
+            return "", ()
+        return f" WHERE {self.partition_column} = ?", (self.guild_id,)
+
+    def load(self):
+        self.map = {}
+        where, params = self._where()
+        try:
+            for row in self.conn.execute(f"SELECT {', '.join(self.columns)} FROM {self.table}{where}", params):
+                self.from_row(row)
+            if self.guild_id is None:
+                self.log.info("Loaded %d entries from %s:%s", len(self.map), self.filename, self.table)
+        except sqlite3.Error as e:
+            self.log.error("Failed to load %s: %s", self.table, e)
+
+    def _serialize(self):
+        # build rows on the loop thread so the writer never reads the live map
+        if None in self.dirty_keys or not self.dirty_keys:
+            keys = None
+            rows = [row for key, value in self.map.items() for row in self.to_rows(key, value)]
+        else:
+            keys = list(self.dirty_keys)
+            rows = [row for key in keys if key in self.map for row in self.to_rows(key, self.map[key])]
+        return keys, rows
+
+    def _write(self, data):
+        keys, rows = data
+        placeholders = ", ".join("?" for _ in self.columns)
+        with self.write_lock, self.conn:
+            if keys is None:
+                where, params = self._where()
+                self.conn.execute(f"DELETE FROM {self.table}{where}", params)
+            else:
+                self.conn.executemany(f"DELETE FROM {self.table} WHERE {self.key_column} = ?", [(k,) for k in keys])
+            self.conn.executemany(
+                f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES ({placeholders})", rows
+            )
+
+    async def close(self):
+        await super().close()
+        if self.owns_conn:
+            self.conn.close()
+
+
+class ReactionRoleSqlite(SqliteHandler):
+    # map shape: {message_id: {emoji: role_id}} for one guild
+    table = "reaction_role_map"
+    key_column = "message_id"
+    partition_column = "guild_id"
+    columns = ("guild_id", "message_id", "emoji", "role_id")
+    schema = """
+        CREATE TABLE IF NOT EXISTS reaction_role_map (
+            message_id INTEGER NOT NULL,
+            emoji TEXT NOT NULL,
+            role_id INTEGER NOT NULL,
+            guild_id INTEGER,
+            PRIMARY KEY (message_id, emoji)
+        ) WITHOUT ROWID;
+    """
+
+    @classmethod
+    def prepare(cls, conn: sqlite3.Connection):
+        super().prepare(conn)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(reaction_role_map)")}
+        if "guild_id" not in columns:
+            # tables from the single-guild days; their rows get a guild in GuildConfigCache.migrate_legacy
+            conn.execute("ALTER TABLE reaction_role_map ADD COLUMN guild_id INTEGER")
+        conn.execute("CREATE INDEX IF NOT EXISTS reaction_role_guild ON reaction_role_map (guild_id)")
+        conn.commit()
+
+    def to_rows(self, key, value) -> list:
+        return [(self.guild_id, key, emoji, role_id) for emoji, role_id in value.items()]
+
+    def from_row(self, row: tuple):
+        _, message_id, emoji, role_id = row
+        self.map.setdefault(message_id, {})[emoji] = role_id
+
+
+class ReactionChannelSqlite(SqliteHandler):
+    # map shape: {message_id: channel_id} for one guild
+    table = "reaction_role_channels"
+    key_column = "message_id"
+    partition_column = "guild_id"
+    columns = ("guild_id", "message_id", "channel_id")
+    schema = """
+        CREATE TABLE IF NOT EXISTS reaction_role_channels (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS reaction_role_channels_guild ON reaction_role_channels (guild_id);
+    """
+
+    def to_rows(self, key, value) -> list:
+        return [(self.guild_id, key, value)]
+
+    def from_row(self, row: tuple):
+        _, message_id, channel_id = row
+        self.map[message_id] = channel_id
+
+
+class WelcomeSqlite(SqliteHandler):
+    # map shape: {guild_id: {"channel_id", "message", "color", "gif_url"}}
+    table = "welcome_config"
+    key_column = "guild_id"
+    partition_column = "guild_id"
+    columns = ("guild_id", "channel_id", "message", "color", "gif_url")
+    schema = """
+        CREATE TABLE IF NOT EXISTS welcome_config (
+            guild_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            color INTEGER,
+            gif_url TEXT
+        );
+    """
+
+    def to_rows(self, key, value) -> list:
+        return [(key, value["channel_id"], value["message"], value.get("color"), value.get("gif_url"))]
+
+    def from_row(self, row: tuple):
+        guild_id, channel_id, message, color, gif_url = row
+        self.map[guild_id] = {"channel_id": channel_id, "message": message, "color": color, "gif_url": gif_url}
+
+
+class TicketSqlite(SqliteHandler):
+    # map shape: {channel_id: {"guild_id", "owner_id", "state", "claimer_id"}}
+    table = "tickets"
+    key_column = "channel_id"
+    columns = ("channel_id", "guild_id", "owner_id", "state", "claimer_id")
+    schema = """
+        CREATE TABLE IF NOT EXISTS tickets (
+            channel_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            owner_id INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            claimer_id INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS tickets_owner ON tickets (guild_id, owner_id);
+    """
+
+    def to_rows(self, key, value) -> list:
+        return [(key, value["guild_id"], value["owner_id"], value["state"], value.get("claimer_id"))]
+
+    def from_row(self, row: tuple):
+        channel_id, guild_id, owner_id, state, claimer_id = row
+        self.map[channel_id] = {"guild_id": guild_id, "owner_id": owner_id, "state": state, "claimer_id": claimer_id}
+
+
+class MuteSqlite(SqliteHandler):
+    # map shape: {guild_id: {user_id: {"role_id", "expires_at"}}}
+    table = "mutes"
+    key_column = "guild_id"
+    columns = ("guild_id", "user_id", "role_id", "expires_at")
+    schema = """
+        CREATE TABLE IF NOT EXISTS mutes (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        ) WITHOUT ROWID;
+    """
+
+    def to_rows(self, key, value) -> list:
+        return [(key, user_id, entry["role_id"], entry["expires_at"]) for user_id, entry in value.items()]
+
+    def from_row(self, row: tuple):
+        guild_id, user_id, role_id, expires_at = row
+        self.map.setdefault(guild_id, {})[user_id] = {"role_id": role_id, "expires_at": expires_at}
@@ -0,0 +1,139 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Optional
+
+import discord
+
+from jsonHandler import JsonHandler
+
+OPEN = "open"
+CLAIMED = "claimed"
+ARCHIVED = "archived"
+
+
+class TicketRegistry:
+    """
+    Persistent record of ticket channels: {channel_id: {"guild_id", "owner_id", "state", "claimer_id"}},
+    with an in-memory (guild id, owner id) -> channel id index over tickets that are still active.
+    """
+
+    def __init__(self, handler: JsonHandler, create_concurrency: int = 2):
+        self.handler = handler
+        self.tickets = handler.map
+        self.by_owner: dict[tuple[int, int], int] = {}
+        self.create_concurrency = create_concurrency
+        self.opening: set[tuple[int, int]] = set()  # (guild id, user id) with a ticket being created
+        self.create_slots: dict[int, asyncio.Semaphore] = {}
+        for channel_id, ticket in self.tickets.items():
+            self._index(channel_id, ticket)
+
+    def _index(self, channel_id: int, ticket: dict):
+        if ticket["state"] != ARCHIVED:
+            self.by_owner[(ticket["guild_id"], ticket["owner_id"])] = channel_id
+
+    def _unindex(self, channel_id: int, ticket: dict):
+        key = (ticket["guild_id"], ticket["owner_id"])
+        if self.by_owner.get(key) == channel_id:
+            del self.by_owner[key]
+
+    def get(self, channel_id: int) -> Optional[dict]:
+        return self.tickets.get(channel_id)
+
+    def active_for(self, guild_id: int, owner_id: int) -> Optional[int]:
+        """Channel id of the owner's open or claimed ticket, if they have one."""
+        return self.by_owner.get((guild_id, owner_id))
+
+    @contextmanager
+    def opening_ticket(self, guild_id: int, owner_id: int):
+        """
+        Claim the right to create a ticket for this user. Yields False if they already have one
+        or one is being made for them right now.
+        """
+        key = (guild_id, owner_id)
+        if key in self.opening or key in self.by_owner:
+            yield False
+            return
+
+        self.opening.add(key)
+        try:
+            yield True
+        finally:
+            self.opening.discard(key)
+
+    def creation_slot(self, guild_id: int) -> asyncio.Semaphore:
+        """Bounds how many ticket channels a guild creates at once."""
+        slot = self.create_slots.get(guild_id)
+        if slot is None:
+            slot = self.create_slots[guild_id] = asyncio.Semaphore(self.create_concurrency)
+        return slot
+
+    @staticmethod
+    def overwrites_for(guild: discord.Guild, owner: discord.abc.Snowflake, staff_roles: list[discord.Role]) -> dict:
+        """Permission overwrites for a new ticket channel: hidden from everyone but the owner and staff."""
+        overwrites = {
+            guild.default_role: discord.PermissionOverwrite(view_channel=False),
+            owner: discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True),
+        }
+        staff = discord.PermissionOverwrite(view_channel=True, send_messages=True)
+        overwrites.update((role, staff) for role in staff_roles)
+        return overwrites
+
+    def create(self, guild_id: int, channel_id: int, owner_id: int, state: str = OPEN, claimer_id: int = None):
+        ticket = {"guild_id": guild_id, "owner_id": owner_id, "state": state, "claimer_id": claimer_id}
+        self.tickets[channel_id] = ticket
+        self._index(channel_id, ticket)
+        self.handler.save(channel_id)
+
+    def claim(self, channel_id: int, claimer_id: int):
+        ticket = self.tickets[channel_id]
+        ticket["state"] = CLAIMED
+        ticket["claimer_id"] = claimer_id
+        self.handler.save(channel_id)
+
+    def archive(self, channel_id: int):
+        ticket = self.tickets[channel_id]
+        ticket["state"] = ARCHIVED
+        self._unindex(channel_id, ticket)
+        self.handler.save(channel_id)
+
+    def remove(self, channel_id: int) -> Optional[dict]:
+        ticket = self.tickets.pop(channel_id, None)
+        if ticket:
+            self._unindex(channel_id, ticket)
+            self.handler.save(channel_id)
+        return ticket
+
+    def reconcile(self, guild: discord.Guild) -> tuple[int, int]:
+        """
+        Drop tickets whose channel no longer exists and adopt "ticket-*" channels from before the registry.
+        Runs once at startup; returns (removed, adopted).
+        """
+        removed = 0
+        for channel_id, ticket in list(self.tickets.items()):
+            if ticket["guild_id"] == guild.id and guild.get_channel(channel_id) is None:
+                self.remove(channel_id)
+                removed += 1
+
+        adopted = 0
+        for channel in guild.text_channels:
+            if channel.id in self.tickets or not channel.name.startswith("ticket-"):
+                continue
+            owner = None
+            for target, perms in channel.overwrites.items():
+                # members missing from the cache come back as Objects typed Member
+                is_member = isinstance(target, discord.Member) or getattr(target, "type", None) is discord.Member
+                if is_member and perms.view_channel and not getattr(target, "bot", False):
+                    owner = target
+                    break
+            if owner is None:
+                continue
+            if channel.name.endswith("-archived"):
+                state = ARCHIVED
+            elif channel.name.endswith("-claimed"):
+                state = CLAIMED
+            else:
+                state = OPEN
+            self.create(guild.id, channel.id, owner.id, state)
+            adopted += 1
+
+        return removed, adopted
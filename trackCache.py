@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+log = logging.getLogger("TrackCache")
+
+YOUTUBE_ID_RE = re.compile(
+    r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})"
+)
+
+# stream urls without a signed expiry get this lifetime
+DEFAULT_TTL = 60 * 60
+# stop handing out a stream url this long before it actually expires
+EXPIRY_MARGIN = 5 * 60
+
+
+def cache_key(url: str) -> str:
+    url = url.strip()
+    match = YOUTUBE_ID_RE.search(url)
+    if match:
+        return f"yt:{match.group(1)}"
+
+    parsed = urlparse(url)
+    if not parsed.netloc:
+        # plain search terms ("default_search": "auto")
+        return f"q:{url.lower()}"
+    host = parsed.netloc.lower().removeprefix("www.")
+    return f"{host}{parsed.path.rstrip('/')}"
+
+
+def stream_expiry(audio_url: str) -> float:
+    """Wall-clock time the signed stream url stops working, or now + DEFAULT_TTL if unsigned."""
+    expire = parse_qs(urlparse(audio_url).query).get("expire")
+    if expire:
+        try:
+            return float(expire[0]) - EXPIRY_MARGIN
+        except ValueError:
+            pass
+    return time.time() + DEFAULT_TTL
+
+
+class TrackCache:
+    def __init__(self, max_size: int = 512, filename: Optional[str] = None):
+        self.max_size = max_size
+        self.filename = filename
+        self.entries: OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.miss_time = 0.0  # total seconds spent extracting on misses
+        if filename:
+            self.load()
+
+    def get(self, url: str) -> Optional[dict]:
+        key = cache_key(url)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry["expires_at"] <= time.time():
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, url: str, info: dict, elapsed: float = 0.0) -> dict:
+        entry = {
+            "url": info["url"],
+            "title": info.get("title", "Unknown Title"),
+            "duration": info.get("duration"),
+            "acodec": info.get("acodec"),
+            "expires_at": info.get("expires_at") or stream_expiry(info["url"]),
+        }
+        key = cache_key(url)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        self.miss_time += elapsed
+        return entry
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        avg_miss = self.miss_time / self.misses if self.misses else 0.0
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_miss_seconds": avg_miss,
+            "saved_seconds": avg_miss * self.hits,
+        }
+
+    def load(self):
+        if not os.path.exists(self.filename):
+            return
+
+        try:
+            with open(self.filename, "r") as file:
+                data = json.load(file)
+        except Exception as e:
+            log.error("Failed to load %s: %s", self.filename, e)
+            return
+
+        now = time.time()
+        for key, entry in data.items():
+            if entry.get("expires_at", 0) > now:
+                self.entries[key] = entry
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        log.info("Loaded %d entries from %s", len(self.entries), self.filename)
+
+    def save(self):
+        if not self.filename:
+            return
+
+        now = time.time()
+        live = {k: v for k, v in self.entries.items() if v["expires_at"] > now}
+        tmp = f"{self.filename}.tmp"
+        os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+        with open(tmp, "w") as file:
+            json.dump(live, file, separators=(",", ":"))
+        os.replace(tmp, self.filename)
@@ -0,0 +1,71 @@
+import asyncio
+import gzip
+import json
+import os
+
+import discord
+
+
+class TranscriptStore:
+    """
+    Ticket transcripts as gzipped JSONL, one message per line, under
+    {directory}/{guild id}/{owner id}/{channel id}.jsonl.gz
+    """
+
+    def __init__(self, directory: str = "transcripts"):
+        self.directory = directory
+
+    def path_for(self, guild_id: int, owner_id: int, channel_id: int) -> str:
+        return os.path.join(self.directory, str(guild_id), str(owner_id), f"{channel_id}.jsonl.gz")
+
+    def list_for(self, guild_id: int, owner_id: int) -> list[str]:
+        """Transcript paths for a user, newest first."""
+        folder = os.path.join(self.directory, str(guild_id), str(owner_id))
+        if not os.path.isdir(folder):
+            return []
+        paths = [os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".jsonl.gz")]
+        return sorted(paths, key=os.path.getmtime, reverse=True)
+
+    async def export(self, channel: discord.TextChannel, path: str, page_size: int = 100) -> int:
+        """
+        Stream the channel's history oldest-first into path. Only one page of messages is held in memory
+        at a time, and the gzip writes happen off the event loop. Returns the number of messages written.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        file = await asyncio.to_thread(gzip.open, tmp, "wt", encoding="utf-8")
+        count = 0
+        try:
+            page = []
+            async for message in channel.history(limit=None, oldest_first=True):
+                page.append(json.dumps(self._record(message), ensure_ascii=False, separators=(",", ":")))
+                if len(page) >= page_size:
+                    await asyncio.to_thread(file.write, "\n".join(page) + "\n")
+                    count += len(page)
+                    page = []
+            if page:
+                await asyncio.to_thread(file.write, "\n".join(page) + "\n")
+                count += len(page)
+            await asyncio.to_thread(file.close)
+        except BaseException:
+            # don't leave a partial export behind; the next attempt starts over (close is a no-op if done)
+            try:
+                await asyncio.to_thread(file.close)
+            finally:
+                await asyncio.to_thread(os.remove, tmp)
+            raise
+
+        os.replace(tmp, path)
+        return count
+
+    @staticmethod
+    def _record(message: discord.Message) -> dict:
+        return {
+            "id": message.id,
+            "created_at": message.created_at.isoformat(),
+            "author_id": message.author.id,
+            "author": str(message.author),
+            "content": message.content,
+            "attachments": [attachment.url for attachment in message.attachments],
+            "embeds": [embed.description for embed in message.embeds if embed.description],
+        }
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+import discord
+
+log = logging.getLogger("VoiceManager")
+
+
+class VoiceManager:
+    """
+    Owns the bot's voice connections, at most one per guild. Joining another channel moves the existing
+    connection instead of opening a second one. A background task disconnects voice clients that have
+    played nothing for idle_timeout seconds, or whose channel has had no listeners for empty_timeout
+    seconds. on_disconnect(guild_id) runs whenever a connection goes away, so per-guild playback state
+    can be dropped with it.
+    """
+
+    def __init__(self, client: discord.Client, on_disconnect: Callable[[int], None], idle_timeout: float = 300,
+                 empty_timeout: float = 30, check_interval: float = 15):
+        self.client = client
+        self.on_disconnect = on_disconnect
+        self.idle_timeout = idle_timeout
+        self.empty_timeout = empty_timeout
+        self.check_interval = check_interval
+        self.locks: dict[int, asyncio.Lock] = {}
+        self.last_active: dict[int, float] = {}  # guild id -> last time something was playing
+        self.empty_since: dict[int, float] = {}  # guild id -> when the channel lost its last listener
+        self.task: Optional[asyncio.Task] = None
+        self.counts = {"connects": 0, "moves": 0, "reused": 0, "idle_disconnects": 0, "empty_disconnects": 0}
+
+    def start(self):
+        self.task = asyncio.create_task(self._reap_forever())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        for voice in list(self.client.voice_clients):
+            await self.disconnect(voice.guild, "shutting down")
+
+    async def connect(self, channel: discord.VoiceChannel) -> discord.VoiceClient:
+        """The guild's voice client, in `channel`, reusing or moving the existing connection if there is one."""
+        guild = channel.guild
+        async with self.locks.setdefault(guild.id, asyncio.Lock()):
+            voice = guild.voice_client
+            if voice is not None and not voice.is_connected():
+                # half-dead after a dropped connection; start over rather than reuse it
+                await voice.disconnect(force=True)
+                voice = None
+
+            if voice is None:
+                voice = await channel.connect()
+                self.counts["connects"] += 1
+            elif voice.channel.id != channel.id:
+                await voice.move_to(channel)
+                self.counts["moves"] += 1
+            else:
+                self.counts["reused"] += 1
+
+            self.touch(guild.id)
+            return voice
+
+    def touch(self, guild_id: int):
+        self.last_active[guild_id] = time.monotonic()
+        self.empty_since.pop(guild_id, None)
+
+    async def disconnect(self, guild: discord.Guild, reason: str):
+        voice = guild.voice_client
+        self.forget(guild.id)
+        if voice is None:
+            return
+        voice.stop()
+        await voice.disconnect()
+        log.info("Left voice: %s", reason, extra={"guild": guild.id})
+
+    def forget(self, guild_id: int):
+        """Drop everything kept for the guild's connection (also used when we get disconnected externally)."""
+        self.last_active.pop(guild_id, None)
+        self.empty_since.pop(guild_id, None)
+        self.on_disconnect(guild_id)
+
+    async def _reap_forever(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.reap()
+            except Exception:
+                log.exception("Reaper failed")
+
+    async def reap(self):
+        now = time.monotonic()
+        for voice in list(self.client.voice_clients):
+            guild = voice.guild
+            if voice.is_playing():
+                self.last_active[guild.id] = now
+            listeners = [member for member in getattr(voice.channel, "members", []) if not member.bot]
+            if listeners:
+                self.empty_since.pop(guild.id, None)
+            elif now - self.empty_since.setdefault(guild.id, now) >= self.empty_timeout:
+                self.counts["empty_disconnects"] += 1
+                await self.disconnect(guild, "channel empty")
+                continue
+            if now - self.last_active.setdefault(guild.id, now) >= self.idle_timeout:
+                self.counts["idle_disconnects"] += 1
+                await self.disconnect(guild, f"idle for {self.idle_timeout:.0f}s")
+
+    @staticmethod
+    def _ffmpeg_running(voice: discord.VoiceClient) -> bool:
+        source = getattr(voice, "source", None)
+        process = getattr(source, "_process", None)
+        return isinstance(source, discord.FFmpegAudio) and process is not None and process.poll() is None
+
+    def stats(self) -> dict:
+        voices = list(self.client.voice_clients)
+        return {
+            "connections": len(voices),
+            "playing": sum(1 for voice in voices if voice.is_playing()),
+            "ffmpeg_processes": sum(1 for voice in voices if self._ffmpeg_running(voice)),
+            **self.counts,
+        }
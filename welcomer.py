@@ -0,0 +1,110 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import discord
+
+
+class WelcomeTemplate:
+    """A guild's welcome config parsed once: message split around {user}, color and image ready to use."""
+
+    def __init__(self, config: dict):
+        self.channel_id = config["channel_id"]
+        self.parts = config.get("message", "Welcome {user}!").split("{user}")
+        color = config.get("color")
+        self.color = discord.Color(0x00FFFF if color is None else color)
+        self.gif_url = config.get("gif_url")
+
+    def render(self, mentions: list[str]) -> discord.Embed:
+        if len(mentions) == 1:
+            who = mentions[0]
+        else:
+            who = f"{', '.join(mentions[:-1])} and {mentions[-1]}"
+        embed = discord.Embed(description=who.join(self.parts), color=self.color)
+        if self.gif_url:
+            embed.set_image(url=self.gif_url)
+        return embed
+
+
+class WelcomePipeline:
+    """
+    Sends welcome embeds. Below batch_threshold joins per minute every member gets their own message;
+    above it, joins are collected for batch_interval seconds and welcomed together in one message.
+    """
+
+    def __init__(self, config_for: Callable[[int], Optional[dict]], batch_threshold: int = 10, batch_interval: float = 5.0,
+                 max_batch: int = 50):
+        self.config_for = config_for  # guild id -> welcome config, or None if the guild has none
+        self.batch_threshold = batch_threshold
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch  # keeps a batched description well under the embed size limit
+        self.templates: dict[int, Optional[WelcomeTemplate]] = {}
+        self.recent_joins: dict[int, deque] = {}
+        self.batches: dict[int, list[str]] = {}
+        self.flush_tasks: dict[int, asyncio.Task] = {}
+        self.messages_sent = 0
+        self.members_welcomed = 0
+
+    def template(self, guild_id: int) -> Optional[WelcomeTemplate]:
+        if guild_id not in self.templates:
+            config = self.config_for(guild_id)
+            self.templates[guild_id] = WelcomeTemplate(config) if config else None
+        return self.templates[guild_id]
+
+    def invalidate(self, guild_id: int):
+        self.templates.pop(guild_id, None)
+
+    def _join_rate(self, guild_id: int) -> int:
+        """Joins in the last 60 seconds, including this one."""
+        now = time.monotonic()
+        joins = self.recent_joins.setdefault(guild_id, deque())
+        joins.append(now)
+        while joins[0] < now - 60:
+            joins.popleft()
+        return len(joins)
+
+    async def submit(self, member: discord.Member):
+        guild = member.guild
+        if self.template(guild.id) is None:
+            return
+
+        rate = self._join_rate(guild.id)
+        if rate <= self.batch_threshold and guild.id not in self.batches:
+            await self._send(guild, [member.mention])
+            return
+
+        batch = self.batches.setdefault(guild.id, [])
+        batch.append(member.mention)
+        if len(batch) >= self.max_batch:
+            await self.flush(guild)
+        elif guild.id not in self.flush_tasks:
+            self.flush_tasks[guild.id] = asyncio.create_task(self._flush_later(guild))
+
+    async def _flush_later(self, guild: discord.Guild):
+        await asyncio.sleep(self.batch_interval)
+        self.flush_tasks.pop(guild.id, None)
+        await self.flush(guild)
+
+    async def flush(self, guild: discord.Guild):
+        mentions = self.batches.pop(guild.id, None)
+        task = self.flush_tasks.pop(guild.id, None)
+        if task and task is not asyncio.current_task():
+            task.cancel()
+        if mentions:
+            await self._send(guild, mentions)
+
+    async def _send(self, guild: discord.Guild, mentions: list[str]):
+        template = self.template(guild.id)
+        if template is None:
+            return
+        channel = guild.get_channel(template.channel_id)
+        if not channel:
+            return
+
+        try:
+            await channel.send(embed=template.render(mentions))
+            self.messages_sent += 1
+            self.members_welcomed += len(mentions)
+        except discord.Forbidden:
+            pass